@@ -0,0 +1,47 @@
+import argparse
+import json
+import random
+import sys
+import timeit
+
+from gamemap import GameMap
+
+
+def measure(size, view_radius, number):
+    rng = random.Random(0)
+    rows = [[0 if rng.random() < 0.2 else 1 for _ in range(size)] for _ in range(size)]
+    game_map = GameMap(rows, [])
+    board = game_map.bitboard
+    cells = [(rng.randrange(size), rng.randrange(size)) for _ in range(64)]
+
+    def moves():
+        for pos in cells:
+            board.moves(pos)
+
+    def window():
+        for pos in cells:
+            board.window(pos, view_radius)
+
+    def timed(function, count):
+        return min(timeit.repeat(function, number=number, repeat=5)) / (number * count) * 1e6
+
+    return {
+        "moves_us": round(timed(moves, len(cells)), 2),
+        "window_us": round(timed(window, len(cells)), 2),
+    }
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Bitboard query cost by map size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[15, 50, 100, 200])
+    parser.add_argument("--view-radius", type=int, default=3)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    results = {f"size={size}": measure(size, args.view_radius, args.number) for size in args.sizes}
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,42 @@
+import argparse
+import json
+import random
+import sys
+import timeit
+from array import array
+
+from energymap import EnergyMap
+from gamemap import GameMap
+
+
+def measure(size, view_radius, number):
+    rng = random.Random(0)
+    rows = [[1] * size for _ in range(size)]
+    game_map = GameMap(rows, [(rng.randrange(size), rng.randrange(size)) for _ in range(6)])
+    energy_map = EnergyMap(game_map)
+    side = 2 * view_radius + 1
+    view = array("i", [rng.randint(0, 100) for _ in range(side * side)])
+    positions = [(rng.randrange(size), rng.randrange(size)) for _ in range(64)]
+
+    def update():
+        for turn, position in enumerate(positions):
+            energy_map.update(turn, position, view, view_radius)
+
+    return min(timeit.repeat(update, number=number, repeat=5)) / (number * len(positions)) * 1e6
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="EnergyMap.update cost per turn by map size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[15, 50, 100, 200])
+    parser.add_argument("--view-radius", type=int, default=3)
+    parser.add_argument("--number", type=int, default=100)
+    args = parser.parse_args()
+
+    results = {f"size={size}": {"update_us": round(measure(size, args.view_radius, args.number), 2)}
+               for size in args.sizes}
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,58 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import main
+from benchmarks.synthetic import make_initial_state
+from mapcache import MapCache, map_key
+
+
+def initial_state_ms(state, map_cache):
+    bot = main.ClientServer(1, map_cache=map_cache)
+    start = time.perf_counter()
+    bot.InitialState(state, None)
+    elapsed = time.perf_counter() - start
+    bot.close()
+    return elapsed * 1e3
+
+
+def measure(size, lighthouses, repeat):
+    state = make_initial_state(size=size, lighthouses=lighthouses, rng=random.Random(size))
+    uncached, cold, warm = [], [], []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as directory:
+            uncached.append(initial_state_ms(state, None))
+            cache = MapCache(directory)
+            # Cold includes writing the cache file
+            cold.append(initial_state_ms(state, cache))
+            warm.append(initial_state_ms(state, cache))
+            file_kb = os.path.getsize(cache.path(map_key(state))) / 1024
+    return {
+        "no_cache_ms": round(min(uncached), 2),
+        "cold_ms": round(min(cold), 2),
+        "warm_ms": round(min(warm), 2),
+        "file_kb": round(file_kb, 1),
+    }
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="InitialState latency without, cold and warm map cache")
+    parser.add_argument("--maps", nargs="+", default=["15:8", "30:20", "50:30", "100:60"],
+                        help="size:lighthouses pairs")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {}
+    for spec in args.maps:
+        size, lighthouses = map(int, spec.split(":"))
+        results[f"size={size},lighthouses={lighthouses}"] = measure(size, lighthouses, args.repeat)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,61 @@
+import argparse
+import json
+import random
+import sys
+import time
+
+import main
+import mcts
+from benchmarks.synthetic import make_initial_state, make_turn
+from scheduler import Deadline
+
+
+def measure(workers, budget, state, turns, horizon):
+    planner = mcts.MctsPlanner(workers=workers, fraction=1.0, horizon=horizon)
+    bot = main.BotGame(planner=planner)
+    bot.load_initial_state(state)
+    elapsed = 0.0
+    try:
+        for turn in turns:
+            start = time.perf_counter()
+            bot.plan_action(turn, Deadline.after(budget))
+            elapsed += time.perf_counter() - start
+    finally:
+        planner.shutdown()
+    return {
+        "rollouts_per_second": round(planner.rollouts / elapsed),
+        "rollouts_per_turn": round(planner.rollouts / len(turns)),
+        "turn_ms": round(elapsed / len(turns) * 1e3, 1),
+    }
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="MCTS planner rollouts per second")
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--budget", type=float, nargs="+", default=[0.05, 0.25], help="Search seconds per turn")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2], help="Extra worker processes")
+    parser.add_argument("--horizon", type=int, default=mcts.HORIZON)
+    parser.add_argument("--lighthouses", type=int, default=12)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    state = make_initial_state(size=25, lighthouses=args.lighthouses, rng=rng)
+    positions = [(lh.Position.X, lh.Position.Y) for lh in state.Lighthouses]
+    turns = []
+    for _ in range(args.turns):
+        turn = make_turn(3, size=25, positions=positions, rng=rng)
+        # Synthetic turns place the player anywhere; keep it on the island
+        turn.Position.X, turn.Position.Y = rng.choice(positions)
+        turns.append(turn)
+
+    results = {}
+    for workers in args.workers:
+        for budget in args.budget:
+            results[f"workers={workers},budget={budget}"] = measure(workers, budget, state, turns, args.horizon)
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main_bench()
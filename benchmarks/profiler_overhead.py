@@ -0,0 +1,66 @@
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import main
+from benchmarks.synthetic import make_initial_state, make_turn
+from profiler import TurnProfiler
+
+
+def measure(profiler, state, turns):
+    cs = main.ClientServer(1, profiler=profiler)
+    cs.bg.load_initial_state(state)
+    samples = []
+    for request in turns:
+        start = time.perf_counter_ns()
+        cs.play_turn(request, None)
+        samples.append((time.perf_counter_ns() - start) / 1000)
+    cs.close()
+    samples.sort()
+    return {
+        "mean_us": round(statistics.fmean(samples), 1),
+        "p50_us": round(statistics.median(samples), 1),
+        "p99_us": round(samples[int(len(samples) * 0.99) - 1], 1),
+    }
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Turn latency with the turn profiler off, idle and active")
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--view-radius", type=int, default=7)
+    parser.add_argument("--lighthouses", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    state = make_initial_state(size=30, lighthouses=args.lighthouses, rng=rng)
+    positions = [(lh.Position.X, lh.Position.Y) for lh in state.Lighthouses]
+    turns = [make_turn(args.view_radius, size=30, positions=positions, rng=rng) for _ in range(args.turns)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        # A threshold no turn reaches, so only the collection cost is measured
+        configs = {
+            "off": None,
+            "idle": TurnProfiler(directory, threshold=60, sample_fraction=0.0),
+            "sampled": TurnProfiler(directory, threshold=60, sample_fraction=1.0),
+            "cprofile": TurnProfiler(directory, threshold=60, sample_fraction=0.0, cprofile_fraction=1.0),
+        }
+        # Interleaved rounds, best of each, so drift on the machine hits every config alike
+        results = {}
+        for _ in range(args.rounds):
+            for name, profiler in configs.items():
+                run = measure(profiler, state, turns)
+                best = results.setdefault(name, run)
+                for metric, value in run.items():
+                    best[metric] = min(best[metric], value)
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,90 @@
+import argparse
+import json
+import multiprocessing
+import random
+import statistics
+import sys
+import time
+from concurrent import futures
+
+import grpc
+
+import main
+from benchmarks.synthetic import make_initial_state, make_turn
+from internal.handler.coms import game_pb2_grpc as game_grpc
+
+
+def serve(mode, address):
+    # Runs in its own process so the load generator does not share the GIL
+    bot = main.BotComs(bot_name="bench", my_address=address, game_server_address=None, server_mode=mode)
+    bot.bot_id = 1
+    bot.start_listening()
+
+
+def measure(address, state, turns, callers, timeout):
+    channel = grpc.insecure_channel(address)
+    grpc.channel_ready_future(channel).result(timeout=30)
+    stub = game_grpc.GameServiceStub(channel)
+    stub.InitialState(state, timeout=30)
+
+    def call(request):
+        start = time.perf_counter_ns()
+        try:
+            stub.Turn(request, timeout=timeout)
+            failed = False
+        except grpc.RpcError:
+            failed = True
+        return (time.perf_counter_ns() - start) / 1000, failed
+
+    start_time = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=callers) as pool:
+        results = list(pool.map(call, turns))
+    elapsed = time.perf_counter() - start_time
+    channel.close()
+
+    samples = sorted(latency for latency, _ in results)
+    return {
+        "calls_per_second": round(len(samples) / elapsed, 1),
+        "p50_us": round(statistics.median(samples), 1),
+        "p95_us": round(samples[int(len(samples) * 0.95) - 1], 1),
+        "p99_us": round(samples[int(len(samples) * 0.99) - 1], 1),
+        "max_us": round(samples[-1], 1),
+        "errors": sum(failed for _, failed in results),
+    }
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Turn tail latency of the thread-pool and grpc.aio servers")
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--callers", type=int, nargs="+", default=[1, 4, 16], help="Concurrent callers")
+    parser.add_argument("--view-radius", type=int, default=7)
+    parser.add_argument("--lighthouses", type=int, default=20)
+    parser.add_argument("--port", type=int, default=50161)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    state = make_initial_state(size=30, lighthouses=args.lighthouses, rng=rng)
+    positions = [(lh.Position.X, lh.Position.Y) for lh in state.Lighthouses]
+    turns = [make_turn(args.view_radius, size=30, positions=positions, rng=rng) for _ in range(args.turns)]
+
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for port, mode in enumerate(("thread", "aio"), start=args.port):
+        address = f"localhost:{port}"
+        server = context.Process(target=serve, args=(mode, address), daemon=True)
+        server.start()
+        try:
+            for callers in args.callers:
+                results[f"{mode}_callers={callers}"] = measure(
+                    address, state, turns, callers, timeout=main.timeout_to_response
+                )
+        finally:
+            server.terminate()
+            server.join()
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,63 @@
+import argparse
+import json
+import random
+import timeit
+
+from benchmarks.synthetic import make_turn
+from snapshot import TurnSnapshot
+
+
+def legacy_decode(turn, player_num=1):
+    # Per-turn decoding as new_turn_action/_try_connect/_center_view used to do it
+    lighthouses = {(lh.Position.X, lh.Position.Y): lh for lh in turn.Lighthouses}
+    owned = [lh for lh in lighthouses.values() if lh.Owner == player_num]
+    for lh in lighthouses.values():
+        _ = [(p.X, p.Y) for p in lh.Connections]
+    view_distance = len(turn.View) // 2
+    view = {
+        (i - view_distance, j - view_distance): energy
+        for i, row in enumerate(turn.View)
+        for j, energy in enumerate(row.Row)
+    }
+    return lighthouses, owned, view
+
+
+def run(view_radius, lighthouses, density, number):
+    rng = random.Random(0)
+    turns = [make_turn(view_radius, lighthouses, density, size=max(15, lighthouses), rng=rng) for _ in range(16)]
+
+    def legacy():
+        for turn in turns:
+            legacy_decode(turn)
+
+    def snapshot():
+        previous = None
+        for turn in turns:
+            previous = TurnSnapshot.decode(turn, previous)
+
+    legacy_us = min(timeit.repeat(legacy, number=number, repeat=5)) / (number * len(turns)) * 1e6
+    snapshot_us = min(timeit.repeat(snapshot, number=number, repeat=5)) / (number * len(turns)) * 1e6
+    return {
+        "view_radius": view_radius,
+        "lighthouses": lighthouses,
+        "connection_density": density,
+        "legacy_us": round(legacy_us, 2),
+        "snapshot_us": round(snapshot_us, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Legacy dict decoding vs TurnSnapshot.decode")
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    results = [
+        run(view_radius, lighthouses, 0.2, args.number)
+        for view_radius in (3, 7)
+        for lighthouses in (6, 30, 100)
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import grpc
+
+import simulator
+from benchmarks.synthetic import make_initial_state
+from internal.handler.coms import game_pb2_grpc as game_grpc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class JoinClock(simulator.GameEngine):
+    # Engine stand-in that only notes when the bot joins
+    def __init__(self):
+        super().__init__(players=1, rows=[], lighthouses=[], rounds=0)
+        self.joined_at = None
+        self.joined_event = threading.Event()
+
+    def Join(self, request, context):
+        self.joined_at = time.perf_counter()
+        self.joined_event.set()
+        return super().Join(request, context)
+
+
+def measure_once(engine_port, bot_port, engine_delay, state):
+    # Cold start of `python main.py` until it has joined and answered
+    # InitialState; the engine comes up `engine_delay` seconds after the bot
+    engine = JoinClock()
+    bot_address = f"localhost:{bot_port}"
+    start = time.perf_counter()
+    bot = subprocess.Popen(
+        [sys.executable, "main.py", "--bn", "startup", "--la", bot_address, "--gs", f"localhost:{engine_port}"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    server = None
+    try:
+        time.sleep(engine_delay)
+        engine_up = time.perf_counter()
+        server = simulator.serve_engine(engine, f"localhost:{engine_port}")
+        if not engine.joined_event.wait(30):
+            raise TimeoutError("Bot did not join")
+
+        channel = grpc.insecure_channel(bot_address)
+        game_grpc.GameServiceStub(channel).InitialState(state, timeout=30, wait_for_ready=True)
+        ready = time.perf_counter()
+        channel.close()
+        return {
+            "join_ms": (engine.joined_at - start) * 1e3,
+            "join_after_engine_ms": (engine.joined_at - engine_up) * 1e3,
+            "ready_ms": (ready - start) * 1e3,
+        }
+    finally:
+        bot.terminate()
+        bot.wait()
+        if server:
+            server.stop(0)
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Bot cold start until joined and ready for InitialState")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--engine-delay", type=float, nargs="+", default=[0.0, 1.0],
+                        help="Seconds the engine starts after the bot")
+    parser.add_argument("--port", type=int, default=50171)
+    args = parser.parse_args()
+
+    state = make_initial_state(size=30, lighthouses=20, rng=random.Random(0))
+    results = {}
+    for delay in args.engine_delay:
+        runs = [measure_once(args.port, args.port + 1, delay, state) for _ in range(args.runs)]
+        results[f"engine_delay={delay}"] = {
+            name: round(statistics.median(run[name] for run in runs), 1) for name in runs[0]
+        }
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main_bench()
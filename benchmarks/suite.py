@@ -0,0 +1,174 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import timeit
+
+import google.protobuf
+from google.protobuf.internal import api_implementation
+
+import main
+import pathfinding
+from benchmarks.synthetic import make_initial_state, make_turn
+from internal.handler.coms import game_pb2
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+TURN_BUDGET_US = main.timeout_to_response * 1e6
+
+# (view radius, lighthouses, connection density)
+CASES = [
+    (3, 6, 0.2),
+    (3, 30, 0.2),
+    (7, 30, 0.5),
+    (7, 100, 0.1),
+]
+
+
+REPEATS = 7
+CALIBRATION_VALUES = list(range(200))
+
+
+def _calibration():
+    # Fixed interpreter-bound workload the cases are measured against
+    table = {}
+    total = 0
+    for value in CALIBRATION_VALUES:
+        table[value & 63] = table.get(value & 63, 0) + value * value
+        total += value % 7
+    return total
+
+
+def _timed(fn, calls, number):
+    # Best per-call time, and the median ratio of each repeat to the
+    # calibration timed right after it. The machine's speed drifts within a
+    # run on shared hosts; the ratio cancels it out, so that is what the
+    # baseline check compares
+    times, ratios = [], []
+    for _ in range(REPEATS):
+        elapsed = timeit.timeit(fn, number=number)
+        times.append(elapsed)
+        ratios.append(elapsed / timeit.timeit(_calibration, number=number))
+    return min(times) / (number * calls) * 1e6, statistics.median(ratios)
+
+
+def run_case(view_radius, lighthouses, density, number, seed=0):
+    # Start every case from a clean heap so earlier cases do not skew it
+    gc.collect()
+    rng = random.Random(seed)
+    size = max(15, 2 * view_radius + 1, int(lighthouses ** 0.5 * 5))
+    state = make_initial_state(size=size, lighthouses=lighthouses, rng=rng)
+    positions = [(lh.Position.X, lh.Position.Y) for lh in state.Lighthouses]
+    turns = [
+        make_turn(view_radius, connection_density=density, size=size, positions=positions, rng=rng)
+        for _ in range(32)
+    ]
+    payloads = [turn.SerializeToString() for turn in turns]
+    views = [[list(row.Row) for row in turn.View] for turn in turns]
+    targets = [rng.choice(positions) for _ in turns]
+
+    def decode():
+        for payload in payloads:
+            game_pb2.NewTurn.FromString(payload)
+
+    bot = main.BotGame(state.PlayerID)
+    bot.load_initial_state(state)
+
+    def new_turn_action():
+        for turn in turns:
+            bot.new_turn_action(turn)
+
+    def next_move():
+        for turn, view, target in zip(turns, views, targets):
+            pathfinding.next_move((turn.Position.X, turn.Position.Y), target, view)
+
+    timings = {
+        "decode_us": _timed(decode, len(turns), number),
+        "new_turn_action_us": _timed(new_turn_action, len(turns), number),
+        "next_move_us": _timed(next_move, len(turns), number),
+    }
+    results = {name: round(us, 2) for name, (us, _) in timings.items()}
+    results["relative"] = {name: round(ratio, 4) for name, (_, ratio) in timings.items()}
+    results["budget_used"] = round(
+        (results["decode_us"] + results["new_turn_action_us"]) / TURN_BUDGET_US, 5
+    )
+    return results
+
+
+def environment():
+    # Relative timings only account for machine speed; a baseline recorded with
+    # another interpreter or protobuf backend is not comparable at all
+    return {
+        "python": platform.python_version(),
+        "protobuf": google.protobuf.__version__,
+        "protobuf_backend": api_implementation.Type(),
+    }
+
+
+def case_name(view_radius, lighthouses, density):
+    return f"view={view_radius},lighthouses={lighthouses},density={density}"
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for case, metrics in results.items():
+        reference = baseline.get(case, {}).get("relative", {})
+        for name, ratio in metrics["relative"].items():
+            if name in reference and ratio > reference[name] * (1 + threshold):
+                change = ratio / reference[name] - 1
+                regressions.append(
+                    f"{case} {name}: {metrics[name]} us vs baseline {baseline[case][name]} us, "
+                    f"{change:+.0%} relative to the calibration"
+                )
+    return regressions
+
+
+def _best(first, second):
+    # Metric by metric best of two runs of a case
+    best = {name: min(value, second[name]) for name, value in first.items() if name != "relative"}
+    best["relative"] = {name: min(value, second["relative"][name]) for name, value in first["relative"].items()}
+    return best
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Turn hot path micro-benchmarks")
+    parser.add_argument("--number", type=int, default=10, help="Loops per timing repeat")
+    parser.add_argument("--baseline", default=BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown over baseline")
+    args = parser.parse_args()
+
+    results = {case_name(*case): run_case(*case, number=args.number) for case in CASES}
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as out:
+            json.dump({"environment": environment(), "results": results}, out, indent=2)
+            out.write("\n")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("environment") != environment():
+        print(f"Baseline recorded on {baseline.get('environment')}, not comparable with {environment()}; "
+              "record one here with --save-baseline", file=sys.stderr)
+        return 0
+    # Timings are noisy on shared machines: re-run a slow case once and
+    # keep its best numbers before calling it a regression
+    for case in CASES:
+        name = case_name(*case)
+        if compare({name: results[name]}, baseline["results"], args.threshold):
+            results[name] = _best(results[name], run_case(*case, number=args.number))
+    regressions = compare(results, baseline["results"], args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
@@ -0,0 +1,50 @@
+import random
+
+from internal.handler.coms import game_pb2
+# Maps are generated as in the simulator
+from simulator import make_map, place_lighthouses
+
+
+def make_initial_state(size: int = 15, lighthouses: int = 6, players: int = 2, player_id: int = 1, rng=random):
+    rows = make_map(size, rng=rng)
+    positions = place_lighthouses(rows, lighthouses, rng=rng)
+    start = rng.choice(positions)
+    return game_pb2.NewPlayerInitialState(
+        PlayerID=player_id,
+        PlayerCount=players,
+        Position=game_pb2.Position(X=start[0], Y=start[1]),
+        Map=[game_pb2.MapRow(Row=row) for row in rows],
+        Lighthouses=[game_pb2.Lighthouse(Position=game_pb2.Position(X=x, Y=y)) for x, y in positions],
+    )
+
+
+def make_turn(view_radius: int = 3, lighthouses: int = 6, connection_density: float = 0.2,
+              size: int = 15, players: int = 2, positions=None, rng=random):
+    positions = positions or [(rng.randrange(size), rng.randrange(size)) for _ in range(lighthouses)]
+    owners = [rng.randint(0, players) for _ in positions]
+
+    connections = {pos: [] for pos in positions}
+    for i, a in enumerate(positions):
+        for b in positions[i + 1:]:
+            if rng.random() < connection_density:
+                connections[a].append(b)
+                connections[b].append(a)
+
+    side = 2 * view_radius + 1
+    x, y = rng.randrange(size), rng.randrange(size)
+    return game_pb2.NewTurn(
+        Position=game_pb2.Position(X=x, Y=y),
+        Score=rng.randint(0, 1000),
+        Energy=rng.randint(0, 200),
+        View=[game_pb2.MapRow(Row=[rng.randint(0, 100) for _ in range(side)]) for _ in range(side)],
+        Lighthouses=[
+            game_pb2.Lighthouse(
+                Position=game_pb2.Position(X=px, Y=py),
+                Owner=owner,
+                Energy=rng.randint(0, 100),
+                Connections=[game_pb2.Position(X=cx, Y=cy) for cx, cy in connections[(px, py)]],
+                HaveKey=rng.random() < 0.5,
+            )
+            for (px, py), owner in zip(positions, owners)
+        ],
+    )
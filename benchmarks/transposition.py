@@ -0,0 +1,71 @@
+import argparse
+import json
+import random
+import sys
+import time
+
+import main
+import simulator
+import transposition
+
+
+def play(seed, cache_size, size, lighthouses, rounds):
+    rng = random.Random(seed)
+    random.seed(seed)
+    rows, positions = simulator.generate_map(size, lighthouses, rng=rng)
+    bots = [main.ClientServer(bot_id=i + 1, cache_size=cache_size) for i in range(2)]
+    elapsed = [0.0]
+    for bot in bots:
+        plan = bot.bg.plan_action
+
+        def timed(turn, deadline=None, plan=plan):
+            start = time.perf_counter()
+            try:
+                return plan(turn, deadline)
+            finally:
+                elapsed[0] += time.perf_counter() - start
+
+        bot.bg.plan_action = timed
+    try:
+        result = simulator.Simulation(rows, positions, bots, rng=rng).run(rounds)
+    finally:
+        for bot in bots:
+            bot.close()
+    tables = [bot.bg.transposition for bot in bots if bot.bg.transposition]
+    stats = {"actions": [sum(t.hits for t in tables), sum(t.misses for t in tables)]}
+    return [p["score"] for p in result["players"]], elapsed[0], stats
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Self-play planning time and hit rates with the transposition table")
+    parser.add_argument("--games", type=int, default=8)
+    parser.add_argument("--size", type=int, default=15)
+    parser.add_argument("--lighthouses", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--cache-size", type=int, default=transposition.TABLE_SIZE)
+    args = parser.parse_args()
+
+    totals = {"off_ms": 0.0, "on_ms": 0.0}
+    counts = {"actions": [0, 0]}
+    for seed in range(args.games):
+        # Best of two runs per setting; the game itself is the same every run
+        off = min(play(seed, 0, args.size, args.lighthouses, args.rounds)[:2] for _ in range(2))
+        on = [play(seed, args.cache_size, args.size, args.lighthouses, args.rounds) for _ in range(2)]
+        best = min(on, key=lambda run: run[1])
+        if best[0] != off[0]:
+            print(f"Game {seed}: scores differ with the table ({best[0]} vs {off[0]})", file=sys.stderr)
+        totals["off_ms"] += off[1] * 1e3
+        totals["on_ms"] += best[1] * 1e3
+        for name, (hits, misses) in best[2].items():
+            counts[name][0] += hits
+            counts[name][1] += misses
+
+    results = {key: round(value, 1) for key, value in totals.items()}
+    for name, (hits, misses) in counts.items():
+        results[f"{name}_hit_rate"] = round(hits / max(1, hits + misses), 3)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main_bench()
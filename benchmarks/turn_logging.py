@@ -0,0 +1,73 @@
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+from google.protobuf import json_format
+
+import main
+from benchmarks.synthetic import make_initial_state, make_turn
+from botlog import setup_logging, stop_logging
+
+
+def legacy_turn(cs, request, out):
+    # What ClientServer.Turn used to do before handing over to the bot
+    print(f"Processing turn: {cs.bg.countT}", file=out)
+    if cs.verbose:
+        print(json_format.MessageToJson(request), file=out)
+    return cs.play_turn(request, None)
+
+
+def measure(turn_fn, turns):
+    samples = []
+    for request in turns:
+        start = time.perf_counter_ns()
+        turn_fn(request)
+        samples.append((time.perf_counter_ns() - start) / 1000)
+    samples.sort()
+    return {
+        "p50_us": round(statistics.median(samples), 1),
+        "p99_us": round(samples[int(len(samples) * 0.99) - 1], 1),
+    }
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Turn latency with and without verbose logging")
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--view-radius", type=int, default=7)
+    parser.add_argument("--lighthouses", type=int, default=20)
+    parser.add_argument("--payload-every", type=int, default=10, help="Payload sampling for the sampled run")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    state = make_initial_state(size=30, lighthouses=args.lighthouses, rng=rng)
+    positions = [(lh.Position.X, lh.Position.Y) for lh in state.Lighthouses]
+    turns = [make_turn(args.view_radius, size=30, positions=positions, rng=rng) for _ in range(args.turns)]
+
+    devnull = open(os.devnull, "w")
+    results = {}
+    for verbose in (False, True):
+        cs = main.ClientServer(1, verbose=verbose)
+        cs.bg.load_initial_state(state)
+        results[f"legacy_print_verbose={verbose}"] = measure(lambda r: legacy_turn(cs, r, devnull), turns)
+
+    # Each configuration gets a fresh writer so no backlog leaks into the next one
+    for process in (False, True):
+        mode = "process" if process else "thread"
+        for verbose, every in ((False, 1), (True, 1), (True, args.payload_every)):
+            setup_logging(logging.DEBUG, stream=devnull, process=process, path=os.devnull)
+            cs = main.ClientServer(1, verbose=verbose, payload_every=every)
+            cs.bg.load_initial_state(state)
+            results[f"{mode}_log_verbose={verbose}_every={every}"] = measure(lambda r: cs.Turn(r, None), turns)
+            stop_logging(timeout=60)
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,63 @@
+from pathfinding import MOVEMENTS, Point
+
+
+# Legal moves for each 3x3 neighbourhood, bit (dy + 1) * 3 + dx + 1 set
+# for playable cells, in MOVEMENTS order
+MOVES_BY_NEIGHBOURHOOD = [
+    tuple((dx, dy) for dx, dy in MOVEMENTS if code >> ((dy + 1) * 3 + dx + 1) & 1)
+    for code in range(512)
+]
+
+
+class Bitboard:
+    # Playable cells and walls of one map packed as bits, for the queries
+    # the cascade makes around a single cell: playable cells are kept as one
+    # int per row (shifted by one, with an empty row above and below) and
+    # walls as one int per column, so they cost the same on any map.
+    def __init__(self, width: int, height: int, playable):
+        self.width = width
+        self.height = height
+        self.rows = [0] * (height + 2)
+        self.wall_columns = [0] * width
+        for idx, cell in enumerate(playable):
+            x, y = idx % width, idx // width
+            if cell:
+                self.rows[y + 1] |= 2 << x
+            else:
+                self.wall_columns[x] |= 1 << y
+
+    def neighbourhood(self, pos: Point) -> int:
+        # Playable cells of the 3x3 block around pos, bit (dy + 1) * 3 + dx + 1
+        x, y = pos
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return 0
+        rows = self.rows
+        return rows[y] >> x & 7 | (rows[y + 1] >> x & 7) << 3 | (rows[y + 2] >> x & 7) << 6
+
+    def moves(self, pos: Point, near: Point = None) -> tuple:
+        # Legal moves from pos (onto playable cells), optionally only those
+        # ending next to (or on) `near`
+        moves = MOVES_BY_NEIGHBOURHOOD[self.neighbourhood(pos)]
+        if near is None:
+            return moves
+        rx, ry = near[0] - pos[0], near[1] - pos[1]
+        return tuple((dx, dy) for dx, dy in moves if abs(rx - dx) <= 1 and abs(ry - dy) <= 1)
+
+    def window(self, pos: Point, radius: int) -> int:
+        # Walls and off-map cells around pos as a mask in the View layout:
+        # bit (dx + radius) * side + dy + radius
+        x, y = pos
+        side = 2 * radius + 1
+        span = (1 << side) - 1
+        height = self.height
+        top = y - radius
+        mask = 0
+        for column, vx in enumerate(range(x - radius, x + radius + 1)):
+            if 0 <= vx < self.width:
+                # Rows past either end of the column read as walls
+                cells = self.wall_columns[vx] | -1 << height
+                cells = cells >> top if top >= 0 else cells << -top | (1 << -top) - 1
+                mask |= (cells & span) << (column * side)
+            else:
+                mask |= span << (column * side)
+        return mask
@@ -0,0 +1,114 @@
+import atexit
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import signal
+import sys
+
+LOGGER_NAME = "bot"
+
+log = logging.getLogger(LOGGER_NAME)
+
+
+class LazyJson:
+    # Defers MessageToJson until the record is actually written, which
+    # happens on the listener thread instead of the RPC thread
+    __slots__ = ("message",)
+
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        from google.protobuf import json_format
+        return json_format.MessageToJson(self.message)
+
+    def __reduce__(self):
+        # Generated messages do not pickle by class, send the wire bytes instead
+        return _lazy_json_from_wire, (type(self.message).__name__, self.message.SerializeToString())
+
+
+def _lazy_json_from_wire(type_name, payload):
+    from internal.handler.coms import game_pb2
+    return LazyJson(getattr(game_pb2, type_name).FromString(payload))
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The stock QueueHandler formats the message before enqueueing it; keep
+    # msg/args as they are so formatting happens in the listener
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class PayloadSampler:
+    # Lets through one payload dump every `every` calls
+    def __init__(self, every: int = 1):
+        self.every = max(1, every)
+        self._count = 0
+
+    def __call__(self) -> bool:
+        self._count += 1
+        return (self._count - 1) % self.every == 0
+
+
+_listener = None
+_writer = None
+
+
+def _write_records(records, path, fmt):
+    # Ctrl-C reaches the whole process group: the writer keeps draining until
+    # stop_logging sends the sentinel, so the last records are not lost
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    target = logging.FileHandler(path) if path else logging.StreamHandler(sys.stdout)
+    target.setFormatter(logging.Formatter(fmt))
+    listener = logging.handlers.QueueListener(records, target)
+    listener.start()
+    listener._thread.join()
+
+
+def setup_logging(level=logging.INFO, stream=None, fmt="%(asctime)s %(levelname)s %(message)s",
+                  process=False, path=None):
+    # Route the bot logger through a queue drained in the background, to
+    # `path` or else `stream` (stdout). By default a thread writes them; with
+    # process=True the records are pickled to a writer process, so formatting
+    # the JSON payloads does not compete for the GIL with the turn planner.
+    global _listener, _writer
+    if _listener is not None or _writer is not None:
+        return
+
+    if process:
+        context = multiprocessing.get_context("spawn")
+        records = context.Queue()
+        _writer = context.Process(target=_write_records, args=(records, path, fmt), daemon=True)
+        _writer.start()
+        _writer.records = records
+    else:
+        target = logging.FileHandler(path) if path else logging.StreamHandler(stream or sys.stdout)
+        target.setFormatter(logging.Formatter(fmt))
+        records = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(records, target, respect_handler_level=True)
+        _listener.start()
+
+    log.handlers[:] = [_DeferredQueueHandler(records)]
+    log.setLevel(level)
+    log.propagate = False
+    atexit.register(stop_logging)
+
+
+def stop_logging(timeout: float = 5.0):
+    # Flushes pending records and stops the writer; a writer process that
+    # cannot drain its backlog within `timeout` seconds is killed
+    global _listener, _writer
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _writer is not None:
+        _writer.records.put_nowait(logging.handlers.QueueListener._sentinel)
+        _writer.join(timeout=timeout)
+        if _writer.is_alive():
+            _writer.records.cancel_join_thread()
+            _writer.terminate()
+        _writer = None
@@ -0,0 +1,78 @@
+import math
+from array import array
+
+from gamemap import GameMap
+
+MAX_CELL_ENERGY = 100
+NEVER_SEEN = -1
+
+
+def regeneration(game_map: GameMap, lighthouses=None) -> array:
+    # Energy a playable cell regrows per turn: floor(5 - distance) summed over
+    # the lighthouses closer than 5 cells
+    lighthouses = game_map.lighthouses if lighthouses is None else lighthouses
+    width = game_map.width
+    regen = array("i", bytes(4 * len(game_map.playable)))
+    for idx, cell in enumerate(game_map.playable):
+        if cell:
+            x, y = idx % width, idx // width
+            regen[idx] = sum(max(0, math.floor(5 - math.dist((x, y), pos))) for pos in lighthouses)
+    return regen
+
+
+class EnergyMap:
+    # Map-wide cell energy remembered from the View windows, indexed like
+    # GameMap (y * width + x). Each turn the view is written in with one
+    # strided slice assignment per view row, so an update costs the same on
+    # any map size. Cells out of sight are extrapolated from when they were
+    # last seen by their regrowth rate; cells never seen are assumed to have
+    # regrown from zero since the start.
+    def __init__(self, game_map: GameMap, regen: array = None):
+        self.width = game_map.width
+        self.height = game_map.height
+        if regen is None:
+            regen = regeneration(game_map)
+        elif not isinstance(regen, array):
+            # A view into the map cache's mapping: copied, since the energy
+            # map is pickled to MCTS worker processes
+            regen = array("i", regen.tobytes())
+        self.regen = regen
+        self.energy = array("i", bytes(4 * len(self.regen)))
+        self.seen = array("i", [NEVER_SEEN]) * len(self.regen)
+        self.turn = 0
+
+    def update(self, turn: int, position, view: array, view_distance: int):
+        # `view` is the flat NewTurn.View, row dx holding the cells (x + dx, y + dy)
+        self.turn = turn
+        side = 2 * view_distance + 1
+        # A missing or malformed View is skipped: assigning a shorter slice
+        # would shrink the array and shift every later cell
+        if len(view) != side * side:
+            return
+        x, y = position
+        y0 = max(0, y - view_distance)
+        y1 = min(self.height, y + view_distance + 1)
+        if y0 >= y1:
+            return
+        first = y0 - (y - view_distance)
+        count = y1 - y0
+        stamp = array("i", [turn]) * count
+        for dx in range(-view_distance, view_distance + 1):
+            vx = x + dx
+            if not 0 <= vx < self.width:
+                continue
+            row = (dx + view_distance) * side + first
+            cells = slice(y0 * self.width + vx, (y1 - 1) * self.width + vx + 1, self.width)
+            self.energy[cells] = view[row:row + count]
+            self.seen[cells] = stamp
+
+    def estimate(self, idx: int, turn: int = None) -> int:
+        turn = self.turn if turn is None else turn
+        seen = self.seen[idx]
+        if seen == NEVER_SEEN:
+            return min(MAX_CELL_ENERGY, self.regen[idx] * turn)
+        return min(MAX_CELL_ENERGY, self.energy[idx] + self.regen[idx] * (turn - seen))
+
+    def get(self, idx: int, default=None) -> int:
+        # Mapping-style access to the current estimates
+        return self.estimate(idx)
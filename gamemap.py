@@ -0,0 +1,143 @@
+from array import array
+from collections import deque
+
+from bitboard import Bitboard
+from pathfinding import MOVEMENTS, Point
+
+UNREACHABLE = 0xFFFF
+NO_STEP = 0xFF
+
+
+class DistanceField:
+    # BFS distances (in turns) from every cell to one target, plus the
+    # movement index (into MOVEMENTS) of a shortest-path step towards it.
+    __slots__ = ("target", "distances", "steps")
+
+    def __init__(self, target: Point, distances: array, steps: bytearray):
+        self.target = target
+        self.distances = distances
+        self.steps = steps
+
+
+class GameMap:
+    # Map rows come from NewPlayerInitialState.Map as Map[y].Row[x], with
+    # non-zero cells being playable and zero cells being walls. `cached`
+    # (MapArtifacts from mapcache) supplies the distance fields instead of
+    # running one BFS per lighthouse.
+    def __init__(self, rows, lighthouses: list[Point], cached=None):
+        self.height = len(rows)
+        self.width = max((len(row) for row in rows), default=0)
+        self.playable = bytearray(self.width * self.height)
+        for y, row in enumerate(rows):
+            for x, cell in enumerate(row):
+                if cell:
+                    self.playable[y * self.width + x] = 1
+        self.bitboard = Bitboard(self.width, self.height, self.playable)
+
+        # Built on first use: a map loaded from the cache may never need it
+        self._neighbours = None
+        self.lighthouses = list(lighthouses)
+        if cached is not None:
+            self.fields = {
+                pos: DistanceField(pos, distances, steps)
+                for pos, distances, steps in zip(self.lighthouses, cached.distances, cached.steps)
+            }
+            self.nearest = cached.nearest
+        else:
+            self.fields = {pos: self._distance_field(pos) for pos in self.lighthouses}
+            self.nearest = self._nearest_lighthouses()
+
+    @classmethod
+    def from_initial_state(cls, state, cached=None):
+        rows = [list(row.Row) for row in state.Map]
+        lighthouses = [(lh.Position.X, lh.Position.Y) for lh in state.Lighthouses]
+        return cls(rows, lighthouses, cached)
+
+    def index(self, pos: Point):
+        x, y = pos
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return None
+
+    def is_playable(self, pos: Point) -> bool:
+        idx = self.index(pos)
+        return idx is not None and bool(self.playable[idx])
+
+    def clamp(self, pos: Point) -> Point:
+        x, y = pos
+        return max(0, min(self.width - 1, x)), max(0, min(self.height - 1, y))
+
+    def distance(self, target: Point, pos: Point):
+        field = self.fields.get(target)
+        idx = self.index(pos)
+        if field is None or idx is None:
+            return None
+        dist = field.distances[idx]
+        return None if dist == UNREACHABLE else dist
+
+    def step_towards(self, target: Point, pos: Point):
+        field = self.fields.get(target)
+        idx = self.index(pos)
+        if field is None or idx is None:
+            return None
+        step = field.steps[idx]
+        if step == NO_STEP:
+            return None
+        return MOVEMENTS[step]
+
+    def neighbours(self, idx: int):
+        # (neighbour index, movement index) pairs of the playable cells around idx
+        return (self._neighbours or self._neighbour_table())[idx]
+
+    def nearest_lighthouse(self, pos: Point):
+        idx = self.index(pos)
+        if idx is None or self.nearest[idx] < 0:
+            return None
+        return self.lighthouses[self.nearest[idx]]
+
+    def _neighbour_table(self) -> list:
+        self._neighbours = [self._cell_neighbours(idx) for idx in range(self.width * self.height)]
+        return self._neighbours
+
+    def _cell_neighbours(self, idx: int):
+        if not self.playable[idx]:
+            return ()
+        x, y = idx % self.width, idx // self.width
+        neighbours = []
+        for move, (dx, dy) in enumerate(MOVEMENTS):
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.width and 0 <= ny < self.height and self.playable[ny * self.width + nx]:
+                neighbours.append((ny * self.width + nx, move))
+        return tuple(neighbours)
+
+    def _distance_field(self, target: Point) -> DistanceField:
+        distances = array("H", [UNREACHABLE]) * (self.width * self.height)
+        steps = bytearray([NO_STEP]) * (self.width * self.height)
+
+        start = self.index(target)
+        if start is not None and self.playable[start]:
+            distances[start] = 0
+            queue = deque([start])
+            neighbours = self._neighbours or self._neighbour_table()
+            while queue:
+                idx = queue.popleft()
+                next_dist = distances[idx] + 1
+                for nidx, move in neighbours[idx]:
+                    if distances[nidx] == UNREACHABLE:
+                        distances[nidx] = next_dist
+                        # Reverse of the move that reached nidx leads back to idx
+                        steps[nidx] = len(MOVEMENTS) - 1 - move
+                        queue.append(nidx)
+
+        return DistanceField(target, distances, steps)
+
+    def _nearest_lighthouses(self) -> array:
+        nearest = array("i", [-1]) * (self.width * self.height)
+        best = array("H", [UNREACHABLE]) * (self.width * self.height)
+        for lh_idx, pos in enumerate(self.lighthouses):
+            distances = self.fields[pos].distances
+            for idx, dist in enumerate(distances):
+                if dist < best[idx]:
+                    best[idx] = dist
+                    nearest[idx] = lh_idx
+        return nearest
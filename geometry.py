@@ -0,0 +1,285 @@
+from pathfinding import Point
+
+# Triangles rasterized at construction (50 lighthouses, ~1.5 s); beyond
+# that their masks take too long and too much memory to keep them all
+EAGER_TRIANGLES = 20000
+
+
+def _orientation(a: Point, b: Point, c: Point) -> int:
+    cross = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    return (cross > 0) - (cross < 0)
+
+
+def on_segment(p: Point, a: Point, b: Point) -> bool:
+    # p lies strictly between a and b
+    if p == a or p == b or _orientation(a, b, p):
+        return False
+    return min(a[0], b[0]) <= p[0] <= max(a[0], b[0]) and min(a[1], b[1]) <= p[1] <= max(a[1], b[1])
+
+
+def segments_cross(a: Point, b: Point, c: Point, d: Point) -> bool:
+    # Segments sharing an endpoint do not cross
+    if a in (c, d) or b in (c, d):
+        return False
+    o1, o2 = _orientation(a, b, c), _orientation(a, b, d)
+    o3, o4 = _orientation(c, d, a), _orientation(c, d, b)
+    if o1 != o2 and o3 != o4 and o1 and o2 and o3 and o4:
+        return True
+    # Collinear overlaps
+    return (
+        (not o1 and on_segment(c, a, b)) or (not o2 and on_segment(d, a, b))
+        or (not o3 and on_segment(a, c, d)) or (not o4 and on_segment(b, c, d))
+    )
+
+
+class ConnectionIndex:
+    # Precomputed legality of every lighthouse pair. A pair (i, j) with i < j
+    # is stored as bit i * count + j; crossings[pair] is the bitmask of pairs
+    # whose segments cross it, and blocked tells whether another lighthouse
+    # lies on it. With the live links kept as the same kind of bitmask,
+    # "can i connect to j now" is a single AND. Every pair is computed up
+    # front, from the side of each line every lighthouse lies on, so turns
+    # do no geometry. `cached` (MapArtifacts) supplies the tables computed
+    # in an earlier game on the same map.
+    def __init__(self, positions: list[Point], cached=None):
+        self.positions = list(positions)
+        self.count = len(self.positions)
+        self.live = 0
+        if cached:
+            self.blocked = cached.blocked
+            self.crossings = dict(cached.crossings)
+        else:
+            self.blocked = 0
+            self.crossings = {}
+            self._precompute()
+
+    def pair(self, i: int, j: int) -> int:
+        return i * self.count + j if i < j else j * self.count + i
+
+    def sync(self, connections: list[int]):
+        # Rebuild live links from per-lighthouse adjacency masks
+        self.live = 0
+        for i, mask in enumerate(connections):
+            for j in range(i + 1, self.count):
+                if mask >> j & 1:
+                    self.live |= 1 << self.pair(i, j)
+
+    def apply(self, added: list[tuple[int, int]], removed: list[tuple[int, int]]):
+        for i, j in added:
+            self.live |= 1 << self.pair(i, j)
+        for i, j in removed:
+            self.live &= ~(1 << self.pair(i, j))
+
+    def is_blocked(self, i: int, j: int) -> bool:
+        return bool(self.blocked >> self.pair(i, j) & 1)
+
+    def crossing_mask(self, i: int, j: int) -> int:
+        return self.crossings[self.pair(i, j)]
+
+    def is_legal(self, i: int, j: int, live: int = None) -> bool:
+        # Against the tracked live links, or another live mask (e.g. a simulated one)
+        if i == j:
+            return False
+        if live is None:
+            live = self.live
+        pair = self.pair(i, j)
+        bit = 1 << pair
+        return not (self.blocked & bit or live & bit or self.crossings[pair] & live)
+
+    def legal_targets(self, i: int, candidates: list[int]) -> list[int]:
+        return [j for j in candidates if self.is_legal(i, j)]
+
+    def _precompute(self):
+        # The same decisions as segments_cross / on_segment, made for whole
+        # sets of lighthouses at once: left[a][b] is the mask of lighthouses
+        # strictly left of the line a -> b (so left[b][a] is its right side)
+        # and inside[a, b] of those strictly between a and b.
+        positions, count = self.positions, self.count
+        left = [[0] * count for _ in range(count)]
+        inside = {}
+        for a in range(count):
+            ax, ay = positions[a]
+            for b in range(a + 1, count):
+                bx, by = positions[b]
+                dx, dy = bx - ax, by - ay
+                x0, x1, y0, y1 = min(ax, bx), max(ax, bx), min(ay, by), max(ay, by)
+                lefts = rights = between = 0
+                for m, (mx, my) in enumerate(positions):
+                    cross = dx * (my - ay) - dy * (mx - ax)
+                    if cross > 0:
+                        lefts |= 1 << m
+                    elif cross < 0:
+                        rights |= 1 << m
+                    elif x0 <= mx <= x1 and y0 <= my <= y1 and (mx, my) != (ax, ay) and (mx, my) != (bx, by):
+                        between |= 1 << m
+                left[a][b], left[b][a] = lefts, rights
+                if between:
+                    inside[a, b] = between
+                    self.blocked |= 1 << self.pair(a, b)
+
+        # Proper crossings: k and l on opposite sides of i-j, and i and j on
+        # opposite sides of k-l (taken as the side of l from i-k and j-k)
+        crossings = self.crossings
+        for i in range(count):
+            for j in range(i + 1, count):
+                lefts, rights = left[i][j], left[j][i]
+                mask = 0
+                for k in bits(lefts | rights):
+                    opposite = rights if lefts >> k & 1 else lefts
+                    others = opposite & ~((2 << k) - 1) & (
+                        left[i][k] & left[k][j] | left[k][i] & left[j][k]
+                    )
+                    if others:
+                        mask |= others << (k * count)
+                crossings[i * count + j] = mask
+
+        # Collinear overlaps: a lighthouse strictly inside k-l crosses it
+        # with each of its links, except those sharing an end with k-l
+        for (k, l), between in inside.items():
+            segment = self.pair(k, l)
+            for m in bits(between):
+                for x in range(count):
+                    if x in (k, l, m):
+                        continue
+                    other = self.pair(m, x)
+                    crossings[segment] |= 1 << other
+                    crossings[other] |= 1 << segment
+
+
+def bits(mask: int):
+    # Indices of the set bits of `mask`, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _cell_mask(cells: bytearray) -> int:
+    # Bit n of the result is set when cells[n] is non-zero
+    packed = bytearray((len(cells) + 7) // 8)
+    for n, cell in enumerate(cells):
+        if cell:
+            packed[n >> 3] |= 1 << (n & 7)
+    return int.from_bytes(packed, "little")
+
+
+class TriangleCoverage:
+    # Playable cells covered by every lighthouse triangle whose three sides
+    # are not blocked by another lighthouse, as bitmasks over the map cells
+    # (bit y * width + x). Triangles are rasterized row by row: each row's
+    # covered span is a single shifted run of bits ANDed with the playable
+    # mask. Maps with up to `eager_triangles` triangles have them all
+    # rasterized up front (or loaded from `cached`), so turns do no
+    # geometry; on bigger ones a triangle is rasterized the first time a
+    # link could close it.
+    def __init__(self, positions: list[Point], width: int, height: int, playable: bytearray,
+                 connection_index: ConnectionIndex, eager_triangles: int = EAGER_TRIANGLES, cached=None):
+        self.positions = list(positions)
+        self.width = width
+        self.height = height
+        self.playable = _cell_mask(playable)
+        self.connection_index = connection_index
+        self.triangles = dict(cached.triangles) if cached else {}
+
+        count = len(self.positions)
+        if not self.triangles and count * (count - 1) * (count - 2) // 6 <= eager_triangles:
+            for i in range(count):
+                for j in range(i + 1, count):
+                    for k in range(j + 1, count):
+                        self.mask((i, j, k))
+
+    def mask(self, triangle: tuple[int, int, int]) -> int:
+        # Covered cells of a sorted triangle; 0 when a side is blocked
+        mask = self.triangles.get(triangle)
+        if mask is None:
+            i, j, k = triangle
+            index = self.connection_index
+            if index.is_blocked(i, j) or index.is_blocked(i, k) or index.is_blocked(j, k):
+                mask = 0
+            else:
+                mask = self._rasterize(self.positions[i], self.positions[j], self.positions[k])
+            self.triangles[triangle] = mask
+        return mask
+
+    def closed_by(self, i: int, j: int, connections: list[int]) -> list[tuple[int, int, int]]:
+        # Triangles a new i-j link would close given the current links
+        common = connections[i] & connections[j]
+        closed = []
+        while common:
+            low = common & -common
+            k = low.bit_length() - 1
+            common ^= low
+            triangle = tuple(sorted((i, j, k)))
+            if self.mask(triangle):
+                closed.append(triangle)
+        return closed
+
+    def covered(self, lighthouses: list[int], connections: list[int]) -> int:
+        # Cells already covered by triangles among the given lighthouses
+        mask = 0
+        for triangle in self.closed_triangles(lighthouses, connections):
+            mask |= self.mask(triangle)
+        return mask
+
+    def closed_triangles(self, lighthouses: list[int], connections: list[int]):
+        members = 0
+        for i in lighthouses:
+            members |= 1 << i
+        for i in lighthouses:
+            for j in lighthouses:
+                if j <= i or not connections[i] >> j & 1:
+                    continue
+                common = connections[i] & connections[j] & members & ~((2 << j) - 1)
+                while common:
+                    low = common & -common
+                    common ^= low
+                    triangle = (i, j, low.bit_length() - 1)
+                    if self.mask(triangle):
+                        yield triangle
+
+    def gain(self, i: int, j: int, connections: list[int], covered: int) -> int:
+        mask = 0
+        for triangle in self.closed_by(i, j, connections):
+            mask |= self.mask(triangle)
+        return (mask & ~covered).bit_count()
+
+    def rank(self, current: int, candidates: list[int], connections: list[int], covered: int) -> list[tuple[int, int]]:
+        # (gain, candidate) pairs, best first
+        return sorted(
+            ((self.gain(current, j, connections, covered), j) for j in candidates),
+            reverse=True,
+        )
+
+    def _rasterize(self, a: Point, b: Point, c: Point) -> int:
+        if not _orientation(a, b, c):
+            return 0
+        edges = ((a, b), (b, c), (c, a))
+        y0 = max(0, min(a[1], b[1], c[1]))
+        y1 = min(self.height - 1, max(a[1], b[1], c[1]))
+        mask = 0
+        for y in range(y0, y1 + 1):
+            # Horizontal cross-section of the (closed) triangle on row y, as
+            # fractions num / den kept exact to decide border cells
+            low = high = None
+            for (px, py), (qx, qy) in edges:
+                if min(py, qy) <= y <= max(py, qy):
+                    if py == qy:
+                        xs = ((min(px, qx), 1), (max(px, qx), 1))
+                    else:
+                        num = px * (qy - py) + (y - py) * (qx - px)
+                        den = qy - py
+                        if den < 0:
+                            num, den = -num, -den
+                        xs = ((num, den),)
+                    for num, den in xs:
+                        if low is None or num * low[1] < low[0] * den:
+                            low = (num, den)
+                        if high is None or num * high[1] > high[0] * den:
+                            high = (num, den)
+            if low is None:
+                continue
+            x0 = max(0, -(-low[0] // low[1]))
+            x1 = min(self.width - 1, high[0] // high[1])
+            if x0 <= x1:
+                mask |= ((1 << (x1 - x0 + 1)) - 1) << (y * self.width + x0)
+        return mask & self.playable
@@ -0,0 +1,111 @@
+from array import array
+
+from internal.handler.coms import game_pb2
+
+COLUMNS = ("x", "y", "energy", "score", "action", "dest_x", "dest_y", "action_energy")
+
+
+class TurnRecord:
+    __slots__ = ("turn",) + COLUMNS
+
+    def __init__(self, turn, *values):
+        self.turn = turn
+        for name, value in zip(COLUMNS, values):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)}" for name in ("turn",) + COLUMNS)
+        return f"TurnRecord({fields})"
+
+
+class TurnHistory:
+    # Ring buffer of the last `capacity` turns, one preallocated int array per
+    # column. With `stream_path` every full NewTurn/NewAction pair is also
+    # appended to a length-delimited protobuf file (see read_stream), so the
+    # whole game can be analysed later without keeping it in memory.
+    def __init__(self, capacity: int = 256, stream_path: str = None):
+        if capacity <= 0:
+            raise ValueError("History capacity must be positive")
+        self.capacity = capacity
+        self.total = 0
+        self._columns = {name: array("i", bytes(4 * capacity)) for name in COLUMNS}
+        self._stream = open(stream_path, "ab") if stream_path else None
+
+    def append(self, turn: game_pb2.NewTurn, action: game_pb2.NewAction):
+        slot = self.total % self.capacity
+        values = (
+            turn.Position.X, turn.Position.Y, turn.Energy, turn.Score,
+            action.Action, action.Destination.X, action.Destination.Y, action.Energy,
+        )
+        for name, value in zip(COLUMNS, values):
+            self._columns[name][slot] = value
+        self.total += 1
+
+        if self._stream:
+            for message in (turn, action):
+                payload = message.SerializeToString()
+                self._stream.write(_encode_varint(len(payload)))
+                self._stream.write(payload)
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def __getitem__(self, index: int) -> TurnRecord:
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("history index out of range")
+        turn = self.total - size + index
+        slot = turn % self.capacity
+        return TurnRecord(turn, *(self._columns[name][slot] for name in COLUMNS))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def last(self):
+        return self[-1] if self.total else None
+
+    def flush(self):
+        if self._stream:
+            self._stream.flush()
+
+    def close(self):
+        if self._stream:
+            self._stream.close()
+            self._stream = None
+
+
+def read_stream(path: str):
+    # Yields the (NewTurn, NewAction) pairs written by TurnHistory
+    with open(path, "rb") as stream:
+        data = stream.read()
+    offset = 0
+    while offset < len(data):
+        messages = []
+        for message_type in (game_pb2.NewTurn, game_pb2.NewAction):
+            size, offset = _decode_varint(data, offset)
+            messages.append(message_type.FromString(data[offset:offset + size]))
+            offset += size
+        yield tuple(messages)
+
+
+def _encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _decode_varint(data, offset: int):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
@@ -0,0 +1,191 @@
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+import grpc
+
+import simulator
+from internal.handler.coms import game_pb2_grpc as game_grpc
+
+PERCENTILES = (0.50, 0.90, 0.99, 0.999)
+
+
+class TurnCapture:
+    # Player that answers through an in-process bot and keeps every request
+    # it got, so the engine's side of a game can be replayed over gRPC
+    def __init__(self, bot):
+        self.bot = bot
+        self.initial_state = None
+        self.turns = []
+
+    def InitialState(self, request, context=None):
+        self.initial_state = request
+        return self.bot.InitialState(request, context)
+
+    def Turn(self, request, context=None):
+        self.turns.append(request)
+        return self.bot.Turn(request, context)
+
+
+def record_game(size, lighthouses, view_radius, turns, seed):
+    # Messages of seat 1 in a self-play game: positions, energies, owners
+    # and links evolve as in a real game of that size
+    import main
+
+    rng = random.Random(seed)
+    rows, positions = simulator.generate_map(size, lighthouses, rng=rng)
+    bots = [main.ClientServer(bot_id=1), main.ClientServer(bot_id=2)]
+    capture = TurnCapture(bots[0])
+    try:
+        simulator.Simulation(rows, positions, [capture, bots[1]], rng=rng, view_radius=view_radius).run(turns)
+    finally:
+        for bot in bots:
+            bot.close()
+    return capture.initial_state, capture.turns
+
+
+def percentile(samples, q):
+    # Nearest-rank percentile of sorted samples
+    return samples[max(0, math.ceil(len(samples) * q) - 1)]
+
+
+def game_metadata(game, state):
+    # Routes the calls of each simulated game to its own game on the bot
+    return ("game-id", f"load-{game}"), ("player-id", str(state.PlayerID))
+
+
+async def play(stub, metadata, turns, rate, warmup, timeout, offset):
+    # Turns of one game, one at a time as the engine sends them, every
+    # 1/rate seconds (back to back when rate is 0). A late answer delays the
+    # next turn rather than queueing turns up.
+    latencies, errors, behind = [], 0, 0
+    loop = asyncio.get_running_loop()
+    interval = 1 / rate if rate else 0.0
+    next_send = loop.time() + interval * offset
+    for number, turn in enumerate(turns):
+        delay = next_send - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        elif interval:
+            behind += 1
+        start = time.perf_counter()
+        try:
+            await stub.Turn(turn, metadata=metadata, timeout=timeout)
+        except grpc.RpcError:
+            errors += 1
+        if number >= warmup:
+            latencies.append(time.perf_counter() - start)
+        next_send = max(next_send + interval, loop.time())
+    return latencies, errors, behind
+
+
+async def run_load(address, games, rate, warmup, timeout):
+    # One channel per game, as each game has its own engine
+    channels = [grpc.aio.insecure_channel(address) for _ in games]
+    try:
+        stubs = [game_grpc.GameServiceStub(channel) for channel in channels]
+        metadata = [game_metadata(game, state) for game, (state, _) in enumerate(games)]
+        # Every game gets its InitialState before any Turn is timed
+        await asyncio.gather(*(
+            stub.InitialState(state, metadata=routing, timeout=30)
+            for stub, routing, (state, _) in zip(stubs, metadata, games)
+        ))
+        # Games start spread over one interval, as independent engines would
+        offsets = random.Random(len(games))
+        start_time = time.perf_counter()
+        results = await asyncio.gather(*(
+            play(stub, routing, turns, rate, warmup, timeout, offsets.random())
+            for stub, routing, (_, turns) in zip(stubs, metadata, games)
+        ))
+        return results, time.perf_counter() - start_time
+    finally:
+        await asyncio.gather(*(channel.close() for channel in channels))
+
+
+def summarize(results, elapsed, games, rate):
+    latencies = sorted(latency for game_latencies, _, _ in results for latency in game_latencies)
+    turns = [turn for _, game_turns in games for turn in game_turns]
+    summary = {
+        "games": len(games),
+        "target_turns_per_second": rate * len(games) if rate else None,
+        "turns": sum(len(game_turns) for _, game_turns in games),
+        "errors": sum(errors for _, errors, _ in results),
+        "behind_schedule": sum(behind for _, _, behind in results),
+        "turns_per_second": round(len(turns) / elapsed, 1),
+        "turn_bytes": round(sum(turn.ByteSize() for turn in turns) / len(turns)),
+    }
+    if latencies:
+        for q in PERCENTILES:
+            summary[f"p{q * 100:g}_ms"] = round(percentile(latencies, q) * 1e3, 3)
+        summary["max_ms"] = round(latencies[-1] * 1e3, 3)
+    return summary
+
+
+def serve(mode, address, max_games):
+    # Bot under test in its own process, so the load generator does not
+    # share its GIL
+    import main
+
+    bot = main.BotComs(bot_name="loadtest", my_address=address, game_server_address=None,
+                       server_mode=mode, max_games=max_games)
+    bot.bot_id = 1
+    bot.start_listening()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Turn throughput and tail latency of a bot served over gRPC")
+    parser.add_argument("--target", default="localhost:3001", help="Address of a running bot (--max-games >= --games)")
+    parser.add_argument("--spawn", choices=("thread", "aio"), default=None,
+                        help="Start a bot in this server mode at --target instead")
+    parser.add_argument("--games", type=int, default=4, help="Concurrent simulated games")
+    parser.add_argument("--turns", type=int, default=500, help="Turns per game")
+    parser.add_argument("--rate", type=float, default=0.0, help="Turns per second per game (0: back to back)")
+    parser.add_argument("--warmup", type=int, default=10, help="Turns per game left out of the latencies")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Turn RPC deadline in seconds")
+    parser.add_argument("--size", type=int, default=15, help="Map side")
+    parser.add_argument("--lighthouses", type=int, default=8)
+    parser.add_argument("--view-radius", type=int, default=simulator.VIEW_RADIUS)
+    parser.add_argument("--maps", type=int, default=0,
+                        help="Distinct recorded games, replayed round-robin by the simulated ones (0: one each)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Also write the summary to this file")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    recorded = [
+        record_game(args.size, args.lighthouses, args.view_radius, args.turns, args.seed + game)
+        for game in range(min(args.maps or args.games, args.games))
+    ]
+    print(f"Recorded {len(recorded)} games in {time.perf_counter() - start_time:.1f} s", file=sys.stderr)
+    games = [recorded[game % len(recorded)] for game in range(args.games)]
+
+    server = None
+    if args.spawn:
+        server = multiprocessing.get_context("spawn").Process(
+            target=serve, args=(args.spawn, args.target, args.games), daemon=True
+        )
+        server.start()
+    try:
+        with grpc.insecure_channel(args.target) as channel:
+            grpc.channel_ready_future(channel).result(timeout=30)
+        results, elapsed = asyncio.run(run_load(args.target, games, args.rate, args.warmup, args.timeout))
+    finally:
+        if server:
+            server.terminate()
+            server.join()
+
+    summary = summarize(results, elapsed, games, args.rate)
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump({"args": vars(args), "summary": summary}, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,175 +1,328 @@
 import argparse
+import asyncio
+import functools
+import inspect
+import logging
+import os
 import random
+import threading
 import time
+from collections import OrderedDict
 from concurrent import futures
 from typing import Tuple
 
 import grpc
-from google.protobuf import json_format
 from grpc import RpcError
 
 from internal.handler.coms import game_pb2
 from internal.handler.coms import game_pb2_grpc as game_grpc
 
+import mcts
 import pathfinding
+from botlog import LazyJson, PayloadSampler, log, setup_logging
+from energymap import EnergyMap
+from gamemap import GameMap
+from history import TurnHistory
+from mapcache import MAX_BYTES, MapArtifacts, MapCache, map_key
+from metrics import REGISTRY, serve_metrics, write_snapshots
+from recording import GameRecorder
+from geometry import ConnectionIndex, TriangleCoverage
+from scheduler import TurnScheduler
+from snapshot import TurnSnapshot
+from tracker import LighthouseTracker
+from transposition import TranspositionTable
 
 timeout_to_response = 1  # 1 second
+near_deadline_margin = 0.1  # turnos que terminan con menos de 100 ms de margen
+join_backoff_base = 0.05  # primer reintento del Join a los 25-50 ms
+join_backoff_max = 1.0  # espera máxima entre reintentos
 
-
-class BotGameTurn:
-    def __init__(self, turn, action):
-        self.turn = turn
-        self.action = action
+# Parámetros de estrategia ajustables (ver tournament.py)
+STRATEGY_PARAMS = {
+    "max_lighthouses": 5,  # faros a conquistar antes de dejar de atacar
+    "recharge_energy": 10,  # por debajo de esta energía se recarga
+    "stuck_turns": 2,  # turnos en el mismo sitio antes de forzar movimiento
+}
 
 
 class BotGame:
-    def __init__(self, player_num=None):
+    def __init__(self, player_num=None, history_size=256, history_path=None, params=None, planner=None,
+                 cache_size=0, map_cache=None, metrics=None):
         self.player_num = player_num
-        self.turn_states = []
+        self.turn_states = TurnHistory(history_size, history_path)
         self.countT = 0
         self.stuck_counter = 0
-        self.max_lighthouses = 5
+        for name, value in {**STRATEGY_PARAMS, **(params or {})}.items():
+            if name not in STRATEGY_PARAMS:
+                raise ValueError(f"Unknown strategy parameter: {name}")
+            setattr(self, name, value)
         self.last_position = None
         self.last_action_type = None  # Para evitar repeticiones de CONNECT o ATTACK
+        self.initial_state = None
+        self.game_map = None
+        self.energy_map = None
+        self.snapshot = None
+        self.lighthouses = LighthouseTracker(player_num)
+        self.connection_index = None
+        self.triangle_coverage = None
+        self.last_changes = None
+        self.pathfinding_share = 0.5
+        # Planificador opcional (MctsPlanner); si no decide, se usa la cascada
+        self.planner = planner
+        # Acciones y caminos ya evaluados en turnos anteriores (0 la desactiva)
+        # Aciertos y fallos de la tabla se cuentan en `metrics`, si se da
+        self.transposition = TranspositionTable(cache_size, metrics=metrics) if cache_size else None
+        self._cacheable = False
+        # Estado de decisión previo al turno en curso, por si se descarta
+        self._decision_state = None
+        # MapCache opcional: lo calculado sobre el mapa se reutiliza entre partidas
+        self.map_cache = map_cache
+
+    def load_initial_state(self, state: game_pb2.NewPlayerInitialState):
+        self.initial_state = state
+        self.adopt_player_id(state.PlayerID)
+        key = map_key(state) if self.map_cache and state.Map else None
+        cached = self.map_cache.load(key) if key else None
+        # Campos de distancia precalculados para cada faro
+        self.game_map = GameMap.from_initial_state(state, cached) if state.Map else None
+        # Energía de todo el mapa, recordada de las vistas de cada turno
+        self.energy_map = EnergyMap(self.game_map, cached.regen if cached else None) if self.game_map else None
+        # Tabla de cruces entre conexiones de todos los pares de faros
+        self._build_connection_tables([(lh.Position.X, lh.Position.Y) for lh in state.Lighthouses], cached)
+        if key and cached is None:
+            self.map_cache.store(key, MapArtifacts.collect(
+                self.game_map, self.energy_map.regen, self.connection_index, self.triangle_coverage
+            ))
+
+    def adopt_player_id(self, player_id):
+        if self.player_num is None and player_id:
+            self.player_num = player_id
+            self.lighthouses = LighthouseTracker(player_id)
+
+    def _build_connection_tables(self, positions, cached=None):
+        self.connection_index = ConnectionIndex(positions, cached=cached)
+        # Celdas cubiertas por cada triángulo posible
+        if self.game_map:
+            self.triangle_coverage = TriangleCoverage(
+                positions, self.game_map.width, self.game_map.height, self.game_map.playable, self.connection_index,
+                cached=cached,
+            )
+            if self.planner:
+                self.planner.load(self.game_map, positions, self.connection_index, self.triangle_coverage)
+
+    def _update_connection_index(self, snap, changes):
+        if self.connection_index is None or self.connection_index.positions != snap.positions:
+            self._build_connection_tables(snap.positions)
+            self.connection_index.sync(self.lighthouses.connections)
+        elif changes.reset:
+            self.connection_index.sync(self.lighthouses.connections)
+        else:
+            self.connection_index.apply(changes.links_added, changes.links_removed)
+
+    def _distance(self, target_pos, cx, cy):
+        if self.game_map:
+            return self.game_map.distance(target_pos, (cx, cy))
+        return abs(target_pos[0] - cx) + abs(target_pos[1] - cy)
+
+    def _clamp(self, nx, ny):
+        if self.game_map:
+            return self.game_map.clamp((nx, ny))
+        return max(0, min(14, nx)), max(0, min(14, ny))
+
+    def _choose_connection(self, current, snap):
+        # Faros propios con clave, aún no conectados con el actual y sin cruces
+        possible = self.connection_index.legal_targets(current, self.lighthouses.connect_candidates(current))
+        if not possible:
+            return None
+
+        # Preferir las conexiones que cierran los triángulos con más celdas nuevas
+        if self.triangle_coverage:
+            connections = self.lighthouses.connections
+            covered = self.triangle_coverage.covered(self.lighthouses.owned_lighthouses(), connections)
+            ranked = self.triangle_coverage.rank(current, possible, connections, covered)
+            best_gain = ranked[0][0]
+            if best_gain:
+                possible = [dest for gain, dest in ranked if gain == best_gain]
 
-    def _get_lighthouses_dict(self, turn: game_pb2.NewTurn):
-        return {
-            (lh.Position.X, lh.Position.Y): lh
-            for lh in turn.Lighthouses
-        }
-
-    def _choose_connection(self, current_pos, lighthouses):
-        possible = []
-        for pos, lh in lighthouses.items():
-            if (
-                    pos != current_pos and
-                    lh.HaveKey and
-                    current_pos not in [(p.X, p.Y) for p in lh.Connections] and
-                    lh.Owner == self.player_num
-            ):
-                possible.append(pos)
-        return random.choice(possible) if possible else None
-
-    def _can_attack(self, lighthouse, my_energy):
-        return lighthouse.Energy < my_energy
-
-    def _find_attackable_lighthouse(self, cx, cy, my_energy, lighthouses):
+        self._cacheable = False
+        return snap.positions[random.choice(possible)]
+
+    def _can_attack(self, lh_energy, my_energy):
+        return lh_energy < my_energy
+
+    def _find_attackable_lighthouse(self, cx, cy, my_energy, snap):
         best_target = None
         min_dist = float('inf')
-        for pos, lh in lighthouses.items():
-            if lh.Owner != self.player_num and self._can_attack(lh, my_energy):
-                dist = abs(pos[0] - cx) + abs(pos[1] - cy)
-                if dist < min_dist:
+        for i in self.lighthouses.enemy_lighthouses():
+            pos = snap.positions[i]
+            if self._can_attack(snap.energies[i], my_energy):
+                dist = self._distance(pos, cx, cy)
+                if dist is not None and dist < min_dist:
                     min_dist = dist
                     best_target = pos
         return best_target
 
-    def _move_towards(self, cx, cy, target_pos, turn):
-        
-        tx, ty = target_pos
-        dx = max(-1, min(1, tx - cx))
-        dy = max(-1, min(1, ty - cy))
-        nx, ny = cx + dx, cy + dy
-
-        nx = max(0, min(14, nx))
-        ny = max(0, min(14, ny))
-
-        # dx, dy = pathfinding.next_move((cx, cy), target_pos, turn.view)
+    def _move_towards(self, cx, cy, target_pos, snap, deadline=None):
 
-        # return self._build_action(game_pb2.MOVE, (cx+dx, cy+dy), 0, turn)
-
-        return self._build_action(game_pb2.MOVE, (nx, ny), 0, turn)
-
-    def _random_move(self, cx, cy, turn):
+        tx, ty = target_pos
+        if snap.view:
+            # La búsqueda de caminos solo usa una parte del tiempo restante
+            path_deadline = deadline.slice(self.pathfinding_share) if deadline else None
+            dx, dy = self._path_move(cx, cy, target_pos, snap, path_deadline)
+        else:
+            dx = max(-1, min(1, tx - cx))
+            dy = max(-1, min(1, ty - cy))
+
+        if self.game_map:
+            # Aceptar el movimiento solo si no nos aleja del faro (teniendo en cuenta los muros)
+            current = self.game_map.distance(target_pos, (cx, cy))
+            proposed = self.game_map.distance(target_pos, (cx + dx, cy + dy))
+            if current is not None and (proposed is None or proposed > current):
+                dx, dy = self.game_map.step_towards(target_pos, (cx, cy)) or (dx, dy)
+
+        nx, ny = self._clamp(cx + dx, cy + dy)
+
+        return self._build_action(game_pb2.MOVE, (nx, ny), 0)
+
+    def _path_move(self, cx, cy, target_pos, snap, deadline):
+        # Los muros de la vista salen del bitboard del mapa: en la vista valen 0, como una celda vacía
+        walls = self.game_map.bitboard.window((cx, cy), snap.view_distance) if self.game_map else 0
+        move = pathfinding.next_move_in_view((cx, cy), target_pos, snap.view, snap.view_distance,
+                                             deadline=deadline, walls=walls)
+        # Una acción con un camino cortado por el plazo no se guarda
+        if deadline is not None and deadline.expired():
+            self._cacheable = False
+        return move
+
+    def _random_move(self, cx, cy):
+        self._cacheable = False
+        if self.game_map:
+            # Solo movimientos a celdas jugables; si no hay ninguno, esperar
+            moves = self.game_map.bitboard.moves((cx, cy))
+            if not moves:
+                return self._build_action(game_pb2.PASS, (cx, cy), 0)
+            dx, dy = random.choice(moves)
+            return self._build_action(game_pb2.MOVE, (cx + dx, cy + dy), 0)
         moves = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
         dx, dy = random.choice(moves)
-        nx, ny = max(0, min(14, cx + dx)), max(0, min(14, cy + dy))
-        return self._build_action(game_pb2.MOVE, (nx, ny), 0, turn)
+        nx, ny = self._clamp(cx + dx, cy + dy)
+        return self._build_action(game_pb2.MOVE, (nx, ny), 0)
 
-    def _build_action(self, action_type, pos_tuple, energy, turn):
+    def _build_action(self, action_type, pos_tuple, energy):
         destination = game_pb2.Position(X=pos_tuple[0], Y=pos_tuple[1])
 
         if action_type == game_pb2.CONNECT:
-            action = game_pb2.NewAction(
+            return game_pb2.NewAction(
                 Action=action_type,
                 Destination=destination
             )
-        else:
-            action = game_pb2.NewAction(
-                Action=action_type,
-                Destination=destination,
-                Energy=energy
-            )
+        return game_pb2.NewAction(
+            Action=action_type,
+            Destination=destination,
+            Energy=energy
+        )
 
-        self.turn_states.append(BotGameTurn(turn, action))
+    def record_action(self, turn, action):
+        self._decision_state = None
+        self.turn_states.append(turn, action)
         self.countT += 1
 
         # Guardar tipo de acción anterior
-        self.last_action_type = action_type
-
-        return action
-
-    def _try_connect(self, lh, lighthouses, turn):
-        cx, cy = lh.Position.X, lh.Position.Y
+        self.last_action_type = action.Action
 
+    def _try_connect(self, current, snap):
         # Solo intentamos conectar si controlamos este faro
-        if lh.Owner != self.player_num:
+        if snap.owners[current] != self.player_num:
             return None
 
-        possible_connections = []
-        for dest_pos, dest_lh in lighthouses.items():
-            if (
-                    dest_pos != (cx, cy) and  # No conectar consigo mismo
-                    dest_lh.HaveKey and  # Tenemos la clave del destino
-                    [cx, cy] not in dest_lh.Connections and  # Aún no está conectado
-                    dest_lh.Owner == self.player_num  # Controlamos el destino
-            ):
-                possible_connections.append(dest_pos)
-
-        if possible_connections:
-            chosen = random.choice(possible_connections)
-            return self._build_action(game_pb2.CONNECT, chosen, 0, turn)
+        return self._choose_connection(current, snap)
 
-        return None
-
-    def _find_adjacent_lighthouse(self, cx, cy, lighthouses):
+    def _find_adjacent_lighthouse(self, cx, cy, snap):
         for dx in [-1, 0, 1]:
             for dy in [-1, 0, 1]:
                 if dx == 0 and dy == 0:
                     continue
                 pos = (cx + dx, cy + dy)
-                if pos in lighthouses:
+                if pos in snap.index:
                     return pos
         return None
 
-    def _find_nearest_any_lighthouse(self, cx, cy, lighthouses):
-        return min(lighthouses.keys(), key=lambda pos: abs(pos[0] - cx) + abs(pos[1] - cy), default=None)
-
-    def _find_nearest_owned_lighthouse(self, cx, cy, lighthouses):
-        return min(
-            [pos for pos, lh in lighthouses.items() if lh.Owner == self.player_num],
-            key=lambda pos: abs(pos[0] - cx) + abs(pos[1] - cy),
-            default=None
-        )
-
-    def _move_around(self, target_pos, cx, cy, turn):
+    def _find_nearest_any_lighthouse(self, cx, cy, snap):
+        if self.game_map:
+            nearest = self.game_map.nearest_lighthouse((cx, cy))
+            if nearest in snap.index:
+                return nearest
+        return min(snap.positions, key=lambda pos: abs(pos[0] - cx) + abs(pos[1] - cy), default=None)
+
+    def _find_nearest_owned_lighthouse(self, cx, cy, snap):
+        owned = [
+            (dist, pos) for pos in (snap.positions[i] for i in self.lighthouses.owned_lighthouses())
+            if (dist := self._distance(pos, cx, cy)) is not None
+        ]
+        return min(owned, default=(None, None))[1]
+
+    def _move_around(self, target_pos, cx, cy):
+        self._cacheable = False
+        if self.game_map:
+            # Movimientos legales que acaban junto al faro
+            moves = self.game_map.bitboard.moves((cx, cy), near=target_pos)
+            if moves:
+                dx, dy = random.choice(moves)
+                return self._build_action(game_pb2.MOVE, (cx + dx, cy + dy), 0)
+            return self._random_move(cx, cy)
         tx, ty = target_pos
         moves = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
         random.shuffle(moves)
         for dx, dy in moves:
             nx, ny = cx + dx, cy + dy
             if abs(nx - tx) <= 1 and abs(ny - ty) <= 1:
-                return self._build_action(game_pb2.MOVE, (nx, ny), 0, turn)
-        return self._random_move(cx, cy, turn)
+                return self._build_action(game_pb2.MOVE, (nx, ny), 0)
+        return self._random_move(cx, cy)
 
-    def new_turn_action(self, turn: game_pb2.NewTurn) -> game_pb2.NewAction:
-        cx, cy = turn.Position.X, turn.Position.Y
-        current_pos = (cx, cy)
-        lighthouses = {(lh.Position.X, lh.Position.Y): lh for lh in turn.Lighthouses}
+    def new_turn_action(self, turn: game_pb2.NewTurn, deadline=None) -> game_pb2.NewAction:
+        action = self.plan_action(turn, deadline)
+        self.record_action(turn, action)
+        return action
 
-        # Contar faros propios
-        owned_lighthouses = [lh for lh in lighthouses.values() if lh.Owner == self.player_num]
-        should_attack_more = len(owned_lighthouses) < self.max_lighthouses
+    def _planned_action(self, planned, snap):
+        action, target = planned
+        if action == mcts.PASS:
+            return self._build_action(game_pb2.PASS, target, 0)
+        if action == mcts.ATTACK:
+            return self._build_action(game_pb2.ATTACK, target, snap.energy)
+        if action >= mcts.CONNECT:
+            return self._build_action(game_pb2.CONNECT, target, 0)
+        return self._build_action(game_pb2.MOVE, target, 0)
+
+    def fallback_action(self, turn: game_pb2.NewTurn) -> game_pb2.NewAction:
+        # Acción segura cuando la planificación no termina a tiempo
+        return self._build_action(game_pb2.PASS, (turn.Position.X, turn.Position.Y), 0)
+
+    def discard_plan(self):
+        # El turno se abandonó: se deshace lo decidido. Lo observado (mapa,
+        # faros, energía) se conserva porque sigue siendo cierto
+        if self._decision_state is not None:
+            self.stuck_counter, self.last_position = self._decision_state
+            self._decision_state = None
+
+    def plan_action(self, turn: game_pb2.NewTurn, deadline=None) -> game_pb2.NewAction:
+        self._decision_state = (self.stuck_counter, self.last_position)
+        snap = TurnSnapshot.decode(turn, self.snapshot)
+        self.snapshot = snap
+        if self.energy_map:
+            self.energy_map.update(self.countT, snap.position, snap.view, snap.view_distance)
+        self.last_changes = self.lighthouses.update(snap)
+        self._update_connection_index(snap, self.last_changes)
+        if self.transposition:
+            self.transposition.update(snap, self.lighthouses, self.last_changes)
+        current_pos = snap.position
+        current = snap.lighthouse_at(current_pos)
+
+        if self.planner:
+            planned = self.planner.plan(snap, self.player_num, self.lighthouses.connections,
+                                        self.connection_index.live, deadline, self.energy_map)
+            if planned:
+                return self._planned_action(planned, snap)
 
         # Detectar si está estancado
         if self.last_position == current_pos:
@@ -178,148 +331,614 @@ class BotGame:
             self.stuck_counter = 0
         self.last_position = current_pos
 
+        if self.transposition is None:
+            return self._cascade_action(snap, current, deadline)
+
+        # Un estado ya visto cuesta una consulta; solo se guardan las
+        # decisiones que no dependen del azar
+        key = self.transposition.action_key(
+            snap, self.lighthouses,
+            snap.energy < self.recharge_energy, self.stuck_counter >= self.stuck_turns, self.last_action_type,
+        )
+        cached = self.transposition.actions.get(key)
+        if cached is not None:
+            action_type, pos = cached
+            return self._build_action(action_type, pos, snap.energy if action_type == game_pb2.ATTACK else 0)
+        self._cacheable = True
+        action = self._cascade_action(snap, current, deadline)
+        if self._cacheable:
+            self.transposition.actions.put(key, (action.Action, (action.Destination.X, action.Destination.Y)))
+        return action
+
+    def _cascade_action(self, snap, current, deadline=None):
+        cx, cy = current_pos = snap.position
+
+        # Contar faros propios
+        owned_lighthouses = self.lighthouses.owned_count()
+        should_attack_more = owned_lighthouses < self.max_lighthouses
+
         # Si poca energía, recargar
-        if turn.Energy < 10:
-            if current_pos in lighthouses:
-                return self._build_action(game_pb2.PASS, current_pos, 0, turn)
-            adj = self._find_adjacent_lighthouse(cx, cy, lighthouses)
+        if snap.energy < self.recharge_energy:
+            if current is not None:
+                return self._build_action(game_pb2.PASS, current_pos, 0)
+            adj = self._find_adjacent_lighthouse(cx, cy, snap)
             if adj:
-                return self._move_around(adj, cx, cy, turn)
-            nearest = self._find_nearest_any_lighthouse(cx, cy, lighthouses)
+                return self._move_around(adj, cx, cy)
+            nearest = self._find_nearest_any_lighthouse(cx, cy, snap)
             if nearest:
-                return self._move_towards(cx, cy, nearest, turn)
-            return self._random_move(cx, cy, turn)
+                return self._move_towards(cx, cy, nearest, snap, deadline)
+            return self._random_move(cx, cy)
 
         # Si estamos en un faro
-        if current_pos in lighthouses:
-            lh = lighthouses[current_pos]
+        if current is not None:
 
             # Si es nuestro, conectar si es posible
-            if lh.Owner == self.player_num:
-                conn_action = self._try_connect(lh, lighthouses, turn)
-                if conn_action:
+            if snap.owners[current] == self.player_num:
+                chosen = self._try_connect(current, snap)
+                if chosen:
                     if self.last_action_type == game_pb2.CONNECT:
-                        return self._random_move(cx, cy, turn)
-                    return conn_action
+                        return self._random_move(cx, cy)
+                    return self._build_action(game_pb2.CONNECT, chosen, 0)
 
 
             # Si no es nuestro, atacar si permitido y posible
-            elif should_attack_more and lh.Energy < turn.Energy:
+            elif should_attack_more and snap.energies[current] < snap.energy:
                 if self.last_action_type == game_pb2.ATTACK:
-                    return self._random_move(cx, cy, turn)
-                energy = turn.Energy
-                return self._build_action(game_pb2.ATTACK, current_pos, energy, turn)
+                    return self._random_move(cx, cy)
+                energy = snap.energy
+                return self._build_action(game_pb2.ATTACK, current_pos, energy)
 
-        # Si lleva 2+ turnos en mismo lugar, forzar movimiento
-        if self.stuck_counter >= 2:
+        # Si lleva stuck_turns+ turnos en mismo lugar, forzar movimiento
+        if self.stuck_counter >= self.stuck_turns:
             self.stuck_counter = 0
-            return self._random_move(cx, cy, turn)
+            return self._random_move(cx, cy)
 
         # Mover hacia faro enemigo si aún queremos atacar
         if should_attack_more:
-            target = self._find_attackable_lighthouse(cx, cy, turn.Energy, lighthouses)
+            target = self._find_attackable_lighthouse(cx, cy, snap.energy, snap)
             if target:
-                return self._move_towards(cx, cy, target, turn)
+                return self._move_towards(cx, cy, target, snap, deadline)
 
         # Patrullar cerca de nuestros faros
-        patrol = self._find_nearest_owned_lighthouse(cx, cy, lighthouses)
+        patrol = self._find_nearest_owned_lighthouse(cx, cy, snap)
         if patrol:
-            return self._move_around(patrol, cx, cy, turn)
+            return self._move_around(patrol, cx, cy)
 
-        return self._random_move(cx, cy, turn)
+        return self._random_move(cx, cy)
 
 
 class BotComs:
-    def __init__(self, bot_name, my_address, game_server_address, verbose=False):
+    def __init__(self, bot_name, my_address, game_server_address, verbose=False, metrics_address=None,
+                 record_path=None, server_mode="thread", max_games=1, planner=None, profiler=None, cache_size=0,
+                 map_cache=None, history_path=None, metrics_snapshot_path=None, metrics_interval=10.0,
+                 payload_every=1):
         self.bot_id = None
         self.bot_name = bot_name
         self.my_address = my_address
         self.game_server_address = game_server_address
         self.verbose = verbose
+        self.payload_every = payload_every
+        self.metrics_address = metrics_address
+        # Snapshot JSON de las métricas, reescrito cada metrics_interval segundos
+        self.metrics_snapshot_path = metrics_snapshot_path
+        self.metrics_interval = metrics_interval
+        self.stop_snapshots = None
+        self.record_path = record_path
+        self.history_path = history_path
+        # "thread": grpc.server con ThreadPoolExecutor; "aio": grpc.aio en un event loop
+        self.server_mode = server_mode
+        # Varias direcciones separadas por comas: se une a una partida por cada una
+        self.listen_addresses = my_address.split(",")
+        self.bot_ids = {}
+        # Con más de una partida se sirven todas desde un GameHost
+        self.max_games = max(max_games, len(self.listen_addresses))
+        # Fábrica de planificadores (uno por partida), None para la cascada
+        self.planner = planner
+        self.profiler = profiler
+        self.cache_size = cache_size
+        self.map_cache = map_cache
+        self.recorder = None
+        self.host = None
+        self.servicers = []
+        self.servers = []
+
+    def run(self):
+        # El servidor escucha antes de unirse: el motor puede mandar
+        # InitialState en cuanto responde al Join
+        if self.server_mode == "aio":
+            try:
+                asyncio.run(self._serve_aio(join=True))
+            except KeyboardInterrupt:
+                pass
+            return
+        self.start_server()
+        self.wait_to_join_game()
+        self.wait_for_termination()
 
     def wait_to_join_game(self):
-        channel = grpc.insecure_channel(self.game_server_address)
+        game_servers = self.game_server_address.split(",")
+        if len(game_servers) == 1:
+            game_servers *= len(self.listen_addresses)
+        elif len(game_servers) != len(self.listen_addresses):
+            raise ValueError(f"{len(self.listen_addresses)} listen addresses but {len(game_servers)} game servers")
+        for address, game_server in zip(self.listen_addresses, game_servers):
+            self.bot_ids[address] = self._join(game_server, address)
+        self.bot_id = self.bot_ids[self.listen_addresses[0]]
+        self._adopt_player_ids()
+
+    def _join(self, game_server_address, address):
+        # Reconexión rápida del canal mientras el motor arranca
+        channel = grpc.insecure_channel(game_server_address, options=[
+            ("grpc.initial_reconnect_backoff_ms", int(join_backoff_base * 1000)),
+            ("grpc.min_reconnect_backoff_ms", int(join_backoff_base * 1000)),
+            ("grpc.max_reconnect_backoff_ms", int(join_backoff_max * 1000)),
+        ])
         client = game_grpc.GameServiceStub(channel)
 
-        player = game_pb2.NewPlayer(name=self.bot_name, serverAddress=self.my_address)
+        player = game_pb2.NewPlayer(name=self.bot_name, serverAddress=address)
 
-        while True:
-            try:
-                player_id = client.Join(player, timeout=timeout_to_response)
-                self.bot_id = player_id.PlayerID
-                print(f"Joined game with ID {player_id.PlayerID}")
-                if self.verbose:
-                    print(json_format.MessageToJson(player_id))
-                break
-            except RpcError as e:
-                print(f"Could not join game: {e.details()}")
-                time.sleep(1)
+        # RNG propio para no alterar la semilla global de las partidas grabadas
+        jitter = random.Random()
+        backoff = join_backoff_base
+        try:
+            while True:
+                ready = grpc.channel_ready_future(channel)
+                try:
+                    ready.result(timeout=timeout_to_response)
+                    player_id = client.Join(player, timeout=timeout_to_response)
+                    log.info("Joined game with ID %s", player_id.PlayerID)
+                    if self.verbose:
+                        log.debug("%s", LazyJson(player_id))
+                    return player_id.PlayerID
+                except grpc.FutureTimeoutError:
+                    ready.cancel()
+                    log.warning("Game server %s not reachable yet", game_server_address)
+                except RpcError as e:
+                    log.warning("Could not join game: %s", e.details())
+                time.sleep(jitter.uniform(backoff / 2, backoff))
+                backoff = min(join_backoff_max, backoff * 2)
+        finally:
+            channel.close()
+
+    def _adopt_player_ids(self):
+        # Los servicers se crean antes del Join, sin ID todavía
+        for address, servicer in self.servicers:
+            if isinstance(servicer, HostedGames):
+                servicer.bot_id = self.bot_ids.get(address)
+            else:
+                servicer.bg.adopt_player_id(self.bot_id)
 
     def start_listening(self):
-        print("Starting to listen on", self.my_address)
-
-        # configure gRPC server
-        grpc_server = grpc.server(
-            futures.ThreadPoolExecutor(max_workers=10),
-            interceptors=(ServerInterceptor(),),
-        )
-
-        # registry of the service
-        cs = ClientServer(bot_id=self.bot_id, verbose=self.verbose)
-        game_grpc.add_GameServiceServicer_to_server(cs, grpc_server)
-
-        # server start
-        grpc_server.add_insecure_port(self.my_address)
-        grpc_server.start()
-
+        if self.server_mode == "aio":
+            try:
+                asyncio.run(self._serve_aio())
+            except KeyboardInterrupt:
+                pass
+            return
+        self.start_server()
+        self.wait_for_termination()
+
+    def start_server(self):
+        log.info("Starting to listen on %s", self.my_address)
+
+        self._export_metrics()
+
+        # configure gRPC server, one per listen address sharing the worker threads
+        executor = futures.ThreadPoolExecutor(max_workers=10)
+        self.servicers = self._servicers()
+        for address, servicer in self.servicers:
+            grpc_server = grpc.server(executor, interceptors=(ServerInterceptor(),))
+            game_grpc.add_GameServiceServicer_to_server(servicer, grpc_server)
+            grpc_server.add_insecure_port(address)
+            grpc_server.start()
+            self.servers.append(grpc_server)
+
+    def wait_for_termination(self):
         try:
-            grpc_server.wait_for_termination()  # wait until server finish
+            self.servers[0].wait_for_termination()  # wait until server finish
         except KeyboardInterrupt:
-            grpc_server.stop(0)
+            for grpc_server in self.servers:
+                grpc_server.stop(0)
+        finally:
+            self._close()
+
+    async def _serve_aio(self, join=False):
+        self._export_metrics()
+
+        self.servicers = self._servicers(asynchronous=True)
+        for address, servicer in self.servicers:
+            grpc_server = grpc.aio.server(interceptors=(AsyncServerInterceptor(),))
+            game_grpc.add_GameServiceServicer_to_server(servicer, grpc_server)
+            grpc_server.add_insecure_port(address)
+            await grpc_server.start()
+            self.servers.append(grpc_server)
+        log.info("Listening on %s", self.my_address)
+        try:
+            if join:
+                await asyncio.get_running_loop().run_in_executor(None, self.wait_to_join_game)
+            await self.servers[0].wait_for_termination()
+        finally:
+            for grpc_server in self.servers:
+                await grpc_server.stop(0)
+            self._close()
+
+    def _export_metrics(self):
+        if self.metrics_address:
+            serve_metrics(self.metrics_address)
+            log.info("Serving metrics on http://%s/metrics", self.metrics_address)
+        if self.metrics_snapshot_path:
+            self.stop_snapshots = write_snapshots(self.metrics_snapshot_path, self.metrics_interval)
+            log.info("Writing metrics to %s", self.metrics_snapshot_path)
+
+    def _servicers(self, asynchronous=False):
+        if self.max_games == 1:
+            # registry of the service
+            if self.record_path:
+                self.recorder = GameRecorder(self.record_path)
+                log.info("Recording game to %s", self.record_path)
+            factory = AsyncClientServer if asynchronous else ClientServer
+            planner = self.planner() if self.planner else None
+            return [(self.my_address, factory(bot_id=self.bot_id, verbose=self.verbose,
+                                              payload_every=self.payload_every, recorder=self.recorder,
+                                              planner=planner, profiler=self.profiler, cache_size=self.cache_size,
+                                              map_cache=self.map_cache, history_path=self.history_path))]
+
+        if self.record_path:
+            log.warning("Recording is only supported with a single game, not recording")
+        self.host = GameHost(
+            factory=AsyncClientServer if asynchronous else ClientServer,
+            verbose=self.verbose,
+            payload_every=self.payload_every,
+            max_games=self.max_games,
+            planner=self.planner,
+            profiler=self.profiler,
+            cache_size=self.cache_size,
+            map_cache=self.map_cache,
+            history_path=self.history_path,
+        )
+        servicer = AsyncHostedGames if asynchronous else HostedGames
+        return [
+            (address, servicer(self.host, address, self.bot_ids.get(address)))
+            for address in self.listen_addresses
+        ]
+
+    def _close(self):
+        # Con una sola partida el servicer es su ClientServer: cierra su
+        # historial, planificador y procesos
+        for _, servicer in self.servicers:
+            if isinstance(servicer, ClientServer):
+                servicer.close()
+        if self.recorder:
+            self.recorder.close()
+        if self.host:
+            self.host.close()
+        # Último snapshot con las partidas ya cerradas
+        if self.stop_snapshots:
+            self.stop_snapshots()
 
 
 class ServerInterceptor(grpc.ServerInterceptor):
+    def __init__(self, metrics=REGISTRY):
+        self.metrics = metrics
+
     def intercept_service(self, continuation, handler_call_details):
-        start_time = time.time_ns()
-        method_name = handler_call_details.method
+        return self.wrap(continuation(handler_call_details), handler_call_details.method)
+
+    def wrap(self, handler, method_name):
+        if handler is None or handler.unary_unary is None:
+            return handler
+
+        method = method_name.rsplit("/", 1)[-1]
+        metrics = self.metrics
+        behavior = handler.unary_unary
+        deserializer = handler.request_deserializer
+
+        def timed_deserializer(data):
+            start_time = time.perf_counter()
+            request = deserializer(data)
+            metrics.observe("deserialize", method, time.perf_counter() - start_time)
+            return request
+
+        def observe(start_time):
+            duration = time.perf_counter_ns() - start_time
+            metrics.observe("handler", method, duration / 1e9)
+            log.info("Unary call: %s, Duration: %d nanoseconds", method_name, duration)
+
+        def timed_behavior(request, context):
+            # Wrap the handler itself: continuation() only looks it up
+            start_time = time.perf_counter_ns()
+            try:
+                return behavior(request, context)
+            finally:
+                observe(start_time)
+
+        async def timed_coroutine(request, context):
+            start_time = time.perf_counter_ns()
+            try:
+                return await behavior(request, context)
+            finally:
+                observe(start_time)
+
+        if inspect.iscoroutinefunction(behavior):
+            timed_behavior = timed_coroutine
+
+        return grpc.unary_unary_rpc_method_handler(
+            timed_behavior,
+            request_deserializer=timed_deserializer if deserializer else None,
+            response_serializer=handler.response_serializer,
+        )
 
-        # Invoke the actual RPC
-        response = continuation(handler_call_details)
 
-        # Log after the call
-        duration = time.time_ns() - start_time
-        print(f"Unary call: {method_name}, Duration: {duration:.2f} nanoseconds")
-        return response
+class AsyncServerInterceptor(grpc.aio.ServerInterceptor):
+    def __init__(self, metrics=REGISTRY):
+        self.interceptor = ServerInterceptor(metrics)
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        return self.interceptor.wrap(handler, handler_call_details.method)
 
 
 class ClientServer(game_grpc.GameServiceServicer):
-    def __init__(self, bot_id, verbose=False):
-        self.bg = BotGame(bot_id)
+    def __init__(self, bot_id, verbose=False, payload_every=1, metrics=REGISTRY, recorder=None, params=None,
+                 planner=None, profiler=None, cache_size=0, map_cache=None, history_path=None):
+        self.bg = BotGame(bot_id, history_path=history_path, params=params, planner=planner, cache_size=cache_size,
+                          map_cache=map_cache, metrics=metrics)
+        # TurnProfiler opcional: vuelca un perfil de los turnos lentos
+        self.profiler = profiler
+        self.metrics = metrics
+        # Grabación opcional de la partida para reproducirla con recording.py
+        self.recorder = recorder
         self.verbose = verbose
+        # Solo se vuelca uno de cada payload_every turnos completos
+        self.payload_sampler = PayloadSampler(payload_every)
+        self.scheduler = TurnScheduler(default_budget=timeout_to_response)
 
     def Join(self, request, context):
         return None
 
+    def close(self):
+        self.scheduler.shutdown()
+        if self.bg.planner:
+            self.bg.planner.shutdown()
+        # Cierra el fichero del historial, si lo hay
+        self.bg.turn_states.close()
+
     def InitialState(self, request, context):
-        print("Receiving InitialState")
+        log.info("Receiving InitialState")
         if self.verbose:
-            print(json_format.MessageToJson(request))
-        self.bg.initial_state = request
+            log.debug("%s", LazyJson(request))
+        if self.recorder:
+            self.recorder.initial_state(request)
+        self.bg.load_initial_state(request)
         return game_pb2.PlayerReady(Ready=True)
 
     def Turn(self, request, context):
-        print(f"Processing turn: {self.bg.countT}")
-        if self.verbose:
-            print(json_format.MessageToJson(request))
-        action = self.bg.new_turn_action(request)
+        log.info("Processing turn: %s", self.bg.countT)
+        if self.verbose and self.payload_sampler():
+            log.debug("%s", LazyJson(request))
+        return self.play_turn(request, context)
+
+    def _plan(self, request):
+        plan = functools.partial(self.bg.plan_action, request)
+        if self.profiler:
+            plan = self.profiler.wrap(plan, self.bg.countT, request.ByteSize())
+        return plan
+
+    def _commit(self, request, action):
+        self.bg.record_action(request, action)
+        if self.recorder:
+            self.recorder.turn(request, action)
+
+    def _discard(self):
+        self.bg.discard_plan()
+        self.metrics.inc("abandoned_turns", "Turn")
+
+    def play_turn(self, request, context):
+        start_time = time.perf_counter()
+        overruns = self.scheduler.overruns
+        # La acción se registra y graba (o el plan se descarta) en el hilo
+        # del planificador, en el orden de los turnos
+        action = self.scheduler.run(
+            context,
+            self._plan(request),
+            lambda: self.bg.fallback_action(request),
+            functools.partial(self._commit, request),
+            self._discard,
+        )
+        return self._finish_turn(request, context, action, start_time, overruns)
+
+    def _finish_turn(self, request, context, action, start_time, overruns):
+        self.metrics.observe("decision", "Turn", time.perf_counter() - start_time)
+        if self.scheduler.overruns != overruns:
+            self.metrics.inc("deadline_overrun_turns", "Turn")
+        remaining = context.time_remaining() if context is not None else None
+        if remaining is not None and remaining < near_deadline_margin:
+            self.metrics.inc("near_deadline_turns", "Turn")
         return action
 
 
+class AsyncClientServer(ClientServer):
+    # Servicer para grpc.aio: las RPC corren en el event loop y el cálculo en
+    # el hilo del planificador, el único que toca BotGame (no es
+    # thread-safe); un Turn nuevo cancela el que siga en curso
+    async def InitialState(self, request, context):
+        return await self.scheduler.call_async(ClientServer.InitialState, self, request, context)
+
+    async def Turn(self, request, context):
+        log.info("Processing turn: %s", self.bg.countT)
+        if self.verbose and self.payload_sampler():
+            log.debug("%s", LazyJson(request))
+        return await self.play_turn_async(request, context)
+
+    async def play_turn_async(self, request, context):
+        start_time = time.perf_counter()
+        overruns = self.scheduler.overruns
+        action = await self.scheduler.run_async(
+            context,
+            self._plan(request),
+            lambda: self.bg.fallback_action(request),
+            functools.partial(self._commit, request),
+            self._discard,
+        )
+        return self._finish_turn(request, context, action, start_time, overruns)
+
+
+class GameHost:
+    # Varias partidas independientes en un mismo proceso, una por clave. Una
+    # partida nueva en una clave sustituye a la anterior; al crear partidas
+    # se descartan las que llevan idle_timeout segundos sin llamadas y, por
+    # encima de max_games, las usadas hace más tiempo.
+    def __init__(self, factory=None, verbose=False, max_games=64, idle_timeout=60.0, metrics=REGISTRY, planner=None,
+                 profiler=None, cache_size=0, map_cache=None, history_path=None, payload_every=1):
+        self.factory = factory or ClientServer
+        self.planner = planner
+        self.profiler = profiler
+        self.cache_size = cache_size
+        self.map_cache = map_cache
+        # Cada partida escribe su historial en history_path con su número
+        self.history_path = history_path
+        self.started = 0
+        self.verbose = verbose
+        self.payload_every = payload_every
+        self.max_games = max_games
+        self.idle_timeout = idle_timeout
+        self.metrics = metrics
+        self.games = OrderedDict()  # clave -> (ClientServer, última llamada)
+        self._lock = threading.Lock()
+
+    def game(self, key, bot_id=None, new=False):
+        now = time.monotonic()
+        with self._lock:
+            entry = self.games.pop(key, None)
+            if entry is not None and new:
+                self._close(entry[0])
+                entry = None
+            if entry is None:
+                self._evict(now)
+                game = self.factory(bot_id=bot_id, verbose=self.verbose, payload_every=self.payload_every,
+                                    metrics=self.metrics, planner=self.planner() if self.planner else None,
+                                    profiler=self.profiler,
+                                    cache_size=self.cache_size, map_cache=self.map_cache,
+                                    history_path=self._history_path())
+                self.started += 1
+                self.metrics.inc("hosted_games_started", "GameHost")
+            else:
+                game = entry[0]
+            self.games[key] = (game, now)
+            return game
+
+    def _history_path(self):
+        if not self.history_path:
+            return None
+        root, extension = os.path.splitext(self.history_path)
+        return f"{root}-{self.started}{extension}"
+
+    def close(self):
+        with self._lock:
+            for game, _ in self.games.values():
+                self._close(game)
+            self.games.clear()
+
+    def _evict(self, now):
+        for key, (game, last_call) in list(self.games.items()):
+            if now - last_call > self.idle_timeout:
+                del self.games[key]
+                self._close(game)
+        while len(self.games) >= self.max_games:
+            _, (game, _) = self.games.popitem(last=False)
+            self._close(game)
+
+    def _close(self, game):
+        game.close()
+        self.metrics.inc("hosted_games_evicted", "GameHost")
+
+
+class HostedGames(game_grpc.GameServiceServicer):
+    # Servicer de una dirección de escucha que enruta cada llamada a su
+    # partida del GameHost: por los campos game-id / player-id de la
+    # metadata si el motor los envía, si no la dirección es la partida
+    def __init__(self, host, address, bot_id=None):
+        self.host = host
+        self.address = address
+        self.bot_id = bot_id
+
+    def _game(self, context, new=False):
+        metadata = dict(context.invocation_metadata() or ()) if context is not None else {}
+        game_id, player_id = metadata.get("game-id"), metadata.get("player-id")
+        if player_id:
+            # ValueError si player-id no es un número
+            bot_id = int(player_id)
+        else:
+            # Con game-id pero sin player-id el ID sale de InitialState
+            bot_id = None if game_id else self.bot_id
+        return self.host.game((self.address, game_id, player_id), bot_id, new)
+
+    def _route(self, context, new=False):
+        try:
+            return self._game(context, new)
+        except ValueError:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "player-id metadata must be an integer")
+
+    def Join(self, request, context):
+        return None
+
+    def InitialState(self, request, context):
+        return self._route(context, new=True).InitialState(request, context)
+
+    def Turn(self, request, context):
+        return self._route(context).Turn(request, context)
+
+
+class AsyncHostedGames(HostedGames):
+    # En grpc.aio context.abort es una corrutina
+    async def _route_async(self, context, new=False):
+        try:
+            return self._game(context, new)
+        except ValueError:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "player-id metadata must be an integer")
+
+    async def InitialState(self, request, context):
+        game = await self._route_async(context, new=True)
+        return await game.InitialState(request, context)
+
+    async def Turn(self, request, context):
+        game = await self._route_async(context)
+        return await game.Turn(request, context)
+
+
 def ensure_params():
     parser = argparse.ArgumentParser(description="Bot configuration")
     parser.add_argument("--bn", type=str, default="random-bot", help="Bot name")
-    parser.add_argument("--la", type=str, required=True, help="Listen address")
-    parser.add_argument("--gs", type=str, required=True, help="Game server address")
+    parser.add_argument("--la", type=str, required=True, help="Listen address(es), comma separated")
+    parser.add_argument("--gs", type=str, required=True, help="Game server address(es), comma separated")
+    parser.add_argument("--metrics", type=str, default=None, help="Metrics listen address (host:port)")
+    parser.add_argument("--metrics-snapshot", type=str, default=None,
+                        help="Write a JSON snapshot of the metrics to this file, periodically and at shutdown")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between metrics snapshots")
+    parser.add_argument("--log-file", type=str, default=None, help="Write the log to this file instead of stdout")
+    parser.add_argument("--log-level", choices=("DEBUG", "INFO", "WARNING", "ERROR"), default=None,
+                        help="Log level (default INFO, DEBUG with --verbose)")
+    parser.add_argument("--verbose", action="store_true", help="Log the request payloads at DEBUG level")
+    parser.add_argument("--payload-every", type=int, default=1,
+                        help="With --verbose, log one Turn payload out of this many")
+    parser.add_argument("--log-process", action="store_true",
+                        help="Format and write the log in a separate process, off the planner's GIL")
+    parser.add_argument("--record", type=str, default=None, help="Record the game to this file")
+    parser.add_argument("--history-path", type=str, default=None,
+                        help="Stream every turn and action to this file (one per game, numbered, with --max-games)")
+    parser.add_argument("--server", choices=("thread", "aio"), default="thread", help="gRPC server mode")
+    parser.add_argument("--max-games", type=int, default=1, help="Games hosted at once")
+    parser.add_argument("--planner", choices=("cascade", "mcts"), default="cascade", help="Turn planner")
+    parser.add_argument("--planner-workers", type=int, default=0, help="Extra processes for the MCTS search")
+    parser.add_argument("--planner-fraction", type=float, default=mcts.SEARCH_FRACTION,
+                        help="Share of the turn deadline the MCTS search may use")
+    parser.add_argument("--profile-dir", type=str, default=None, help="Write profiles of slow turns here")
+    parser.add_argument("--profile-threshold", type=float, default=0.5, help="Slow turn threshold in seconds")
+    parser.add_argument("--profile-sample", type=float, default=1.0, help="Fraction of turns stack-sampled")
+    parser.add_argument("--profile-cprofile", type=float, default=0.0, help="Fraction of turns run under cProfile")
+    parser.add_argument("--cache-size", type=int, default=0, help="Transposition table entries (0 disables it)")
+    parser.add_argument("--map-cache", type=str, default=None, help="Keep per-map precomputation in this directory")
+    parser.add_argument("--map-cache-mb", type=int, default=MAX_BYTES >> 20, help="Map cache size cap in MiB")
 
     args = parser.parse_args()
 
@@ -330,21 +949,54 @@ def ensure_params():
     if not args.gs:
         raise ValueError("Game server address is required")
 
-    return args.bn, args.la, args.gs
+    return args
 
 
 def main():
-    verbose = False
-    bot_name, listen_address, game_server_address = ensure_params()
+    args = ensure_params()
+    # --verbose vuelca los mensajes a nivel DEBUG, que pasa a ser el nivel por defecto
+    level = args.log_level or ("DEBUG" if args.verbose else "INFO")
+    setup_logging(getattr(logging, level), process=args.log_process, path=args.log_file)
+
+    planner = pool = None
+    if args.planner == "mcts":
+        # Un solo pool de procesos para todas las partidas, arrancado antes
+        # de que llegue el primer InitialState
+        if args.planner_workers:
+            pool = mcts.SearchPool(args.planner_workers)
+            pool.start()
+        planner = functools.partial(mcts.MctsPlanner, fraction=args.planner_fraction, pool=pool)
+
+    profiler = None
+    if args.profile_dir:
+        from profiler import TurnProfiler
+        profiler = TurnProfiler(args.profile_dir, args.profile_threshold, args.profile_sample, args.profile_cprofile)
+
+    map_cache = MapCache(args.map_cache, args.map_cache_mb << 20) if args.map_cache else None
 
     bot = BotComs(
-        bot_name=bot_name,
-        my_address=listen_address,
-        game_server_address=game_server_address,
-        verbose=verbose,
+        bot_name=args.bn,
+        my_address=args.la,
+        game_server_address=args.gs,
+        verbose=args.verbose,
+        payload_every=args.payload_every,
+        metrics_address=args.metrics,
+        metrics_snapshot_path=args.metrics_snapshot,
+        metrics_interval=args.metrics_interval,
+        record_path=args.record,
+        history_path=args.history_path,
+        server_mode=args.server,
+        max_games=args.max_games,
+        planner=planner,
+        profiler=profiler,
+        cache_size=args.cache_size,
+        map_cache=map_cache,
     )
-    bot.wait_to_join_game()
-    bot.start_listening()
+    try:
+        bot.run()
+    finally:
+        if pool:
+            pool.shutdown()
 
 def test_pust():
     return True
@@ -0,0 +1,206 @@
+import hashlib
+import mmap
+import os
+import threading
+from array import array
+
+from history import _decode_varint, _encode_varint
+
+# Bump whenever any stored artifact changes meaning or layout
+VERSION = 2
+MAGIC = b"LHMAP" + bytes((VERSION,))
+HEADER_SIZE = 24
+SUFFIX = ".lhmap"
+MAX_BYTES = 256 << 20
+
+
+def map_key(state) -> str:
+    # Hash of the map rows and lighthouse positions of a NewPlayerInitialState
+    digest = hashlib.blake2b(MAGIC, digest_size=16)
+    for row in state.Map:
+        digest.update(len(row.Row).to_bytes(4, "little"))
+        digest.update(array("i", row.Row).tobytes())
+    for lh in state.Lighthouses:
+        digest.update(array("i", (lh.Position.X, lh.Position.Y)).tobytes())
+    return digest.hexdigest()
+
+
+def _write_int(out: bytearray, value: int):
+    raw = value.to_bytes((value.bit_length() + 7) // 8, "little")
+    out += _encode_varint(len(raw))
+    out += raw
+
+
+def _read_int(data, offset: int):
+    size, offset = _decode_varint(data, offset)
+    if offset + size > len(data):
+        raise IndexError("int past the end of the buffer")
+    return int.from_bytes(data[offset:offset + size], "little"), offset + size
+
+
+class MapArtifacts:
+    # Everything derived from the map alone: per-cell arrays (nearest
+    # lighthouse, regeneration, one distance field and step table per
+    # lighthouse) and the geometry computed up front (blocked pairs, pair
+    # crossings and triangle masks). Loaded ones are memoryviews over the
+    # mapped file rather than arrays.
+    __slots__ = ("width", "height", "nearest", "regen", "distances", "steps", "blocked", "crossings", "triangles")
+
+    def __init__(self, width, height, nearest, regen, distances, steps, blocked=0, crossings=None, triangles=None):
+        self.width = width
+        self.height = height
+        self.nearest = nearest
+        self.regen = regen
+        self.distances = distances
+        self.steps = steps
+        self.blocked = blocked
+        self.crossings = crossings or {}
+        self.triangles = triangles or {}
+
+    @classmethod
+    def collect(cls, game_map, regen, connection_index=None, coverage=None) -> "MapArtifacts":
+        fields = [game_map.fields[pos] for pos in game_map.lighthouses]
+        return cls(
+            game_map.width, game_map.height, game_map.nearest, regen,
+            [field.distances for field in fields], [field.steps for field in fields],
+            connection_index.blocked if connection_index else 0,
+            connection_index.crossings if connection_index else None,
+            coverage.triangles if coverage else None,
+        )
+
+    def to_bytes(self) -> bytes:
+        # Header, then the fixed-size arrays widest first so every one stays
+        # aligned, then the geometry as varint-prefixed ints
+        out = bytearray(MAGIC + bytes(2))
+        out += array("I", (self.width, self.height, len(self.distances), 0)).tobytes()
+        out += array("i", self.nearest).tobytes()
+        out += array("i", self.regen).tobytes()
+        for distances in self.distances:
+            out += array("H", distances).tobytes()
+        for steps in self.steps:
+            out += bytes(steps)
+        _write_int(out, self.blocked)
+        out += _encode_varint(len(self.crossings))
+        for pair, mask in self.crossings.items():
+            out += _encode_varint(pair)
+            _write_int(out, mask)
+        out += _encode_varint(len(self.triangles))
+        for (i, j, k), mask in self.triangles.items():
+            out += _encode_varint(i) + _encode_varint(j) + _encode_varint(k)
+            _write_int(out, mask)
+        return bytes(out)
+
+    @classmethod
+    def from_buffer(cls, data) -> "MapArtifacts":
+        # Zero-copy for the per-cell arrays; raises ValueError on a file of
+        # another version or one cut short
+        if bytes(data[:len(MAGIC)]) != MAGIC or len(data) < HEADER_SIZE:
+            raise ValueError("not a map cache file of this version")
+        width, height, count, _ = memoryview(data)[8:HEADER_SIZE].cast("I")
+        cells = width * height
+        end = HEADER_SIZE + cells * (8 + 3 * count)
+        if len(data) < end:
+            raise ValueError("truncated map cache file")
+        view = memoryview(data)
+        offset = HEADER_SIZE
+        nearest = view[offset:offset + 4 * cells].cast("i")
+        offset += 4 * cells
+        regen = view[offset:offset + 4 * cells].cast("i")
+        offset += 4 * cells
+        distances = []
+        for _ in range(count):
+            distances.append(view[offset:offset + 2 * cells].cast("H"))
+            offset += 2 * cells
+        steps = []
+        for _ in range(count):
+            steps.append(view[offset:offset + cells])
+            offset += cells
+
+        try:
+            blocked, offset = _read_int(data, offset)
+            crossings = {}
+            size, offset = _decode_varint(data, offset)
+            for _ in range(size):
+                pair, offset = _decode_varint(data, offset)
+                crossings[pair], offset = _read_int(data, offset)
+            triangles = {}
+            size, offset = _decode_varint(data, offset)
+            for _ in range(size):
+                i, offset = _decode_varint(data, offset)
+                j, offset = _decode_varint(data, offset)
+                k, offset = _decode_varint(data, offset)
+                triangles[i, j, k], offset = _read_int(data, offset)
+        except IndexError:
+            raise ValueError("truncated map cache file") from None
+        if offset != len(data):
+            raise ValueError("map cache file of the wrong size")
+        return cls(width, height, nearest, regen, distances, steps, blocked, crossings, triangles)
+
+
+class MapCache:
+    # One file per map in `directory`, named by map_key. Files are written
+    # to a temporary name and renamed into place, so concurrent bots (or
+    # tournament workers) only ever see complete files; a load refreshes
+    # the file's mtime, and once the directory holds more than `max_bytes`
+    # the least recently used files are removed.
+    def __init__(self, directory: str, max_bytes: int = MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def load(self, key: str):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                # The mapping outlives the file object; it is unmapped once
+                # the last view into it is dropped
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            artifacts = MapArtifacts.from_buffer(data)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return artifacts
+
+    def store(self, key: str, artifacts: MapArtifacts):
+        path = self.path(key)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(artifacts.to_bytes())
+            os.replace(temporary, path)
+        except OSError:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            return
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
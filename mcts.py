@@ -0,0 +1,407 @@
+import math
+import multiprocessing
+import random
+import threading
+from collections import OrderedDict
+from concurrent import futures
+
+from energymap import EnergyMap, regeneration
+from gamemap import GameMap
+from geometry import ConnectionIndex, TriangleCoverage, bits
+from pathfinding import MOVEMENTS
+from scheduler import Deadline
+# Game rules the forward model shares with the simulator
+from simulator import LIGHTHOUSE_DECAY, LIGHTHOUSE_POINTS, LINK_POINTS, MAX_CELL_ENERGY
+
+# Actions: 0-7 index MOVEMENTS, then pass, attack and CONNECT + target
+PASS = len(MOVEMENTS)
+ATTACK = PASS + 1
+CONNECT = PASS + 2
+
+HORIZON = 12
+EXPLORATION = 1.4
+# Share of the remaining turn deadline the search may use
+SEARCH_FRACTION = 0.5
+# Time kept back for collecting the worker results
+COLLECT_MARGIN = 0.01
+# Scores memoized per (owned lighthouses, live links)
+POINTS_CACHE_SIZE = 65536
+# Forward models kept per worker process, one per map being played
+WORKER_MODELS = 8
+
+
+class SearchState:
+    # Everything a rollout changes. Lighthouse energies are stored with the
+    # turn they were set at and decayed on read; cells hold the turn they
+    # were last harvested at, and regrow from `cells` (the energy seen at the
+    # root) otherwise.
+    __slots__ = ("turn", "pos", "energy", "score", "owners", "lh_energy", "lh_since",
+                 "keys", "links", "live", "harvested", "cells")
+
+    def __init__(self, pos, energy, owners, lh_energy, keys, links, live, cells,
+                 turn=0, score=0, lh_since=None, harvested=None):
+        self.turn = turn
+        self.pos = pos
+        self.energy = energy
+        self.score = score
+        self.owners = owners
+        self.lh_energy = lh_energy
+        self.lh_since = lh_since or [0] * len(owners)
+        self.keys = keys
+        self.links = links
+        self.live = live
+        self.harvested = harvested or {}
+        self.cells = cells
+
+    def copy(self) -> "SearchState":
+        return SearchState(
+            self.pos, self.energy, self.owners[:], self.lh_energy[:], self.keys, self.links[:], self.live,
+            self.cells, self.turn, self.score, self.lh_since[:], dict(self.harvested),
+        )
+
+    def __reduce__(self):
+        return SearchState, (self.pos, self.energy, self.owners, self.lh_energy, self.keys, self.links,
+                             self.live, self.cells, self.turn, self.score, self.lh_since, self.harvested)
+
+
+class ForwardModel:
+    # Single-player forward model of the game for one map: our moves,
+    # attacks and connects, cell regrowth and harvest, lighthouse decay and
+    # the per-turn score of lighthouses, links and triangles. Opponents are
+    # not simulated; their lighthouses only decay.
+    def __init__(self, game_map: GameMap, positions, connection_index: ConnectionIndex = None,
+                 coverage: TriangleCoverage = None):
+        self.game_map = game_map
+        self.width = game_map.width
+        self.positions = list(positions)
+        self.count = len(self.positions)
+        self.connection_index = connection_index or ConnectionIndex(self.positions)
+        self.coverage = coverage or TriangleCoverage(
+            self.positions, game_map.width, game_map.height, game_map.playable, self.connection_index
+        )
+        self.lighthouse_at = {game_map.index(pos): i for i, pos in enumerate(self.positions)}
+        self.steps = [game_map.fields[pos].steps for pos in self.positions]
+        self.regen = regeneration(game_map, self.positions)
+        self._points = {}
+
+    @classmethod
+    def from_spec(cls, spec) -> "ForwardModel":
+        width, height, playable, positions = spec
+        rows = [list(playable[y * width:(y + 1) * width]) for y in range(height)]
+        return cls(GameMap(rows, positions), positions)
+
+    def spec(self):
+        # Picklable description a worker process rebuilds the model from
+        return self.width, self.game_map.height, bytes(self.game_map.playable), tuple(self.positions)
+
+    def root(self, snap, connections, live, energy_map: EnergyMap = None) -> SearchState:
+        # Cell energies come from the map-wide estimates when there are any;
+        # otherwise visible cells keep their energy and the rest count one
+        # turn of regrowth
+        if energy_map is not None:
+            cells = energy_map
+        else:
+            cells = {}
+            (cx, cy), vd = snap.position, snap.view_distance
+            side = 2 * vd + 1
+            for dx in range(-vd, vd + 1):
+                for dy in range(-vd, vd + 1):
+                    idx = self.game_map.index((cx + dx, cy + dy))
+                    if idx is not None:
+                        cells[idx] = snap.view[(dx + vd) * side + dy + vd]
+        keys = 0
+        for i, key in enumerate(snap.keys):
+            if key:
+                keys |= 1 << i
+        return SearchState(
+            self.game_map.index(snap.position), snap.energy, list(snap.owners), list(snap.energies),
+            keys, list(connections), live, cells,
+        )
+
+    def lighthouse_energy(self, state: SearchState, i: int) -> int:
+        return max(0, state.lh_energy[i] - LIGHTHOUSE_DECAY * (state.turn - state.lh_since[i]))
+
+    def owner(self, state: SearchState, i: int) -> int:
+        return state.owners[i] if self.lighthouse_energy(state, i) else 0
+
+    def cell_energy(self, state: SearchState, idx: int) -> int:
+        since = state.harvested.get(idx)
+        if since is None:
+            base, since = state.cells.get(idx, self.regen[idx]), 0
+        else:
+            base = 0
+        return min(MAX_CELL_ENERGY, base + self.regen[idx] * (state.turn - since))
+
+    def actions(self, state: SearchState, me: int) -> list[int]:
+        actions = [move for _, move in self.game_map.neighbours(state.pos)]
+        actions.append(PASS)
+        i = self.lighthouse_at.get(state.pos)
+        if i is not None:
+            if self.owner(state, i) != me:
+                if state.energy > self.lighthouse_energy(state, i):
+                    actions.append(ATTACK)
+            else:
+                actions.extend(CONNECT + j for j in self._connect_targets(state, me, i))
+        return actions
+
+    def step(self, state: SearchState, action: int, me: int):
+        # Our action, this turn's score, then the next turn's harvest
+        if action < PASS:
+            dx, dy = MOVEMENTS[action]
+            state.pos += dy * self.width + dx
+        elif action == ATTACK:
+            self._attack(state, me, self.lighthouse_at[state.pos])
+        elif action >= CONNECT:
+            i, j = self.lighthouse_at[state.pos], action - CONNECT
+            state.links[i] |= 1 << j
+            state.links[j] |= 1 << i
+            state.live |= 1 << self.connection_index.pair(i, j)
+            state.keys &= ~(1 << j)
+
+        state.score += self.points(state, me)
+        state.turn += 1
+        state.energy += self.cell_energy(state, state.pos)
+        state.harvested[state.pos] = state.turn
+        i = self.lighthouse_at.get(state.pos)
+        if i is not None:
+            state.keys |= 1 << i
+
+    def rollout(self, state: SearchState, me: int, turns: int, rng: random.Random):
+        # Default policy: take lighthouses that can be taken, link what can be
+        # linked, otherwise walk towards one random lighthouse
+        target = self.steps[rng.randrange(self.count)] if self.count else None
+        for _ in range(turns):
+            action = None
+            i = self.lighthouse_at.get(state.pos)
+            if i is not None:
+                if self.owner(state, i) != me:
+                    if state.energy > self.lighthouse_energy(state, i):
+                        action = ATTACK
+                else:
+                    targets = self._connect_targets(state, me, i)
+                    if targets:
+                        action = CONNECT + rng.choice(targets)
+                    else:
+                        target = self.steps[rng.randrange(self.count)]
+            if action is None:
+                step = target[state.pos] if target is not None else len(MOVEMENTS)
+                if step < len(MOVEMENTS) and rng.random() < 0.8:
+                    action = step
+                else:
+                    moves = self.game_map.neighbours(state.pos)
+                    action = rng.choice(moves)[1] if moves else PASS
+            self.step(state, action, me)
+
+    def points(self, state: SearchState, me: int) -> int:
+        owned = 0
+        for i in range(self.count):
+            if state.owners[i] == me and self.lighthouse_energy(state, i):
+                owned |= 1 << i
+        key = (owned, state.live)
+        points = self._points.get(key)
+        if points is None:
+            if len(self._points) >= POINTS_CACHE_SIZE:
+                self._points.clear()
+            lighthouses = list(bits(owned))
+            links = sum((state.links[i] & owned & ~((2 << i) - 1)).bit_count() for i in lighthouses)
+            cells = self.coverage.covered(lighthouses, state.links).bit_count()
+            points = self._points[key] = LIGHTHOUSE_POINTS * len(lighthouses) + LINK_POINTS * links + cells
+        return points
+
+    def _attack(self, state: SearchState, me: int, i: int):
+        spent, state.energy = state.energy, 0
+        current = self.lighthouse_energy(state, i)
+        if self.owner(state, i) == me:
+            current += spent
+        else:
+            current -= spent
+            if current < 0:
+                state.owners[i], current = me, -current
+                # Changing hands drops every link of the lighthouse
+                for j in bits(state.links[i]):
+                    state.links[j] &= ~(1 << i)
+                    state.live &= ~(1 << self.connection_index.pair(i, j))
+                state.links[i] = 0
+        state.lh_energy[i], state.lh_since[i] = current, state.turn
+
+    def _connect_targets(self, state: SearchState, me: int, i: int) -> list[int]:
+        return [
+            j for j in bits(state.keys)
+            if j != i and self.owner(state, j) == me and self.connection_index.is_legal(i, j, state.live)
+        ]
+
+
+class _Node:
+    __slots__ = ("untried", "children", "visits", "total")
+
+    def __init__(self):
+        self.untried = None
+        self.children = {}
+        self.visits = 0
+        self.total = 0.0
+
+
+def search(model: ForwardModel, root: SearchState, me: int, deadline: Deadline, rng: random.Random,
+           horizon: int = HORIZON, exploration: float = EXPLORATION, max_iterations: int = None):
+    # UCT over our own action sequences until the deadline. Returns
+    # {root action: (visits, total value)} and the number of rollouts; a
+    # rollout's value is its average score per turn over the horizon.
+    tree = _Node()
+    low, high = math.inf, -math.inf
+    iterations = 0
+    while not deadline.expired() and (max_iterations is None or iterations < max_iterations):
+        state = root.copy()
+        node, path, depth = tree, [tree], 0
+        while depth < horizon:
+            if node.untried is None:
+                node.untried = model.actions(state, me)
+                rng.shuffle(node.untried)
+            if node.untried:
+                action = node.untried.pop()
+                child = node.children[action] = _Node()
+                model.step(state, action, me)
+                path.append(child)
+                depth += 1
+                break
+            if not node.children:
+                break
+            # Values are normalized to the range seen so far
+            spread = high - low if high > low else 1.0
+            log_visits = math.log(node.visits)
+            action, node = max(
+                node.children.items(),
+                key=lambda item: (item[1].total / item[1].visits - low) / spread
+                + exploration * math.sqrt(log_visits / item[1].visits),
+            )
+            model.step(state, action, me)
+            path.append(node)
+            depth += 1
+
+        model.rollout(state, me, horizon - depth, rng)
+        value = (state.score - root.score) / horizon
+        low, high = min(low, value), max(high, value)
+        for node in path:
+            node.visits += 1
+            node.total += value
+        iterations += 1
+
+    return {action: (child.visits, child.total) for action, child in tree.children.items()}, iterations
+
+
+_worker_models = OrderedDict()
+
+
+def _search_worker(spec, root, me, expires_at, seed, horizon, exploration):
+    # Models are built once per map in each worker process. The deadline is
+    # absolute (time.monotonic is system-wide), so a search that waited in
+    # the queue behind other games does not run past its turn.
+    model = _worker_models.pop(spec, None)
+    if model is None:
+        model = ForwardModel.from_spec(spec)
+        if len(_worker_models) >= WORKER_MODELS:
+            _worker_models.popitem(last=False)
+    _worker_models[spec] = model
+    return search(model, root, me, Deadline(expires_at), random.Random(seed), horizon, exploration)
+
+
+def _warm_up():
+    return True
+
+
+class SearchPool:
+    # Worker processes for root-parallel searches, shared by every planner of
+    # the process: with several hosted games they all submit here instead of
+    # each starting (and warming up) its own processes.
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context("spawn")
+                self._executor = futures.ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                futures.wait([self._executor.submit(_warm_up) for _ in range(self.workers)])
+            return self._executor
+
+    def submit(self, fn, *args):
+        return self.start().submit(fn, *args)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+class MctsPlanner:
+    # Picks the turn's action by Monte Carlo tree search over a ForwardModel,
+    # within `fraction` of the remaining turn deadline. With workers > 0 the
+    # same root is also searched in that many processes (root
+    # parallelization) and the root statistics are summed. Those processes
+    # come from `pool` when given (shared, left running on shutdown), else
+    # from a pool of its own.
+    def __init__(self, workers: int = 0, fraction: float = SEARCH_FRACTION, horizon: int = HORIZON,
+                 exploration: float = EXPLORATION, default_budget: float = 1.0, pool: SearchPool = None):
+        self.workers = pool.workers if pool else workers
+        self.fraction = fraction
+        self.horizon = horizon
+        self.exploration = exploration
+        self.default_budget = default_budget
+        self.model = None
+        self.rollouts = 0
+        self._spec = None
+        self._pool = pool
+        self._own_pool = pool is None
+
+    def load(self, game_map: GameMap, positions, connection_index=None, coverage=None):
+        self.model = ForwardModel(game_map, positions, connection_index, coverage)
+        self._spec = self.model.spec()
+        if self.workers and self._pool is None:
+            self._pool = SearchPool(self.workers)
+        if self._pool is not None:
+            self._pool.start()
+
+    def plan(self, snap, me: int, connections, live: int, deadline: Deadline = None, energy_map: EnergyMap = None):
+        # (action, target lighthouse or None) or None when there is nothing to search
+        if self.model is None or self.model.positions != snap.positions:
+            return None
+        deadline = (deadline or Deadline.after(self.default_budget)).slice(self.fraction)
+        root = self.model.root(snap, connections, live, energy_map)
+
+        pending = []
+        if self._pool is not None and not deadline.expired():
+            expires_at = deadline.expires_at - COLLECT_MARGIN
+            pending = [
+                self._pool.submit(_search_worker, self._spec, root, me, expires_at, random.getrandbits(32),
+                                  self.horizon, self.exploration)
+                for _ in range(self.workers)
+            ]
+        stats, rollouts = search(self.model, root, me, deadline, random.Random(random.getrandbits(32)),
+                                 self.horizon, self.exploration)
+        if pending:
+            done, _ = futures.wait(pending, timeout=deadline.remaining() + COLLECT_MARGIN)
+            for future in done:
+                worker_stats, worker_rollouts = future.result()
+                rollouts += worker_rollouts
+                for action, (visits, total) in worker_stats.items():
+                    merged = stats.get(action, (0, 0.0))
+                    stats[action] = (merged[0] + visits, merged[1] + total)
+        self.rollouts += rollouts
+        if not stats:
+            return None
+
+        action = max(stats, key=lambda a: (stats[a][0], stats[a][1]))
+        if action < PASS:
+            dx, dy = MOVEMENTS[action]
+            return action, (snap.position[0] + dx, snap.position[1] + dy)
+        if action >= CONNECT:
+            return action, self.model.positions[action - CONNECT]
+        return action, snap.position
+
+    def shutdown(self):
+        # A shared pool outlives its planners
+        if self._pool is not None and self._own_pool:
+            self._pool.shutdown()
+            self._pool = None
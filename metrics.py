@@ -0,0 +1,148 @@
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+# Upper bounds in seconds; the last bucket catches everything above
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, math.inf,
+)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = array("Q", bytes(8 * len(bounds)))
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.bounds[-1]
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name: str, method: str, seconds: float):
+        with self._lock:
+            histogram = self.histograms.get((name, method))
+            if histogram is None:
+                histogram = self.histograms[name, method] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, method: str, amount: int = 1):
+        with self._lock:
+            self.counters[name, method] = self.counters.get((name, method), 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "histograms": {
+                    f"{name}/{method}": {
+                        "count": h.count,
+                        "sum": h.sum,
+                        "p50": h.quantile(0.50),
+                        "p95": h.quantile(0.95),
+                        "p99": h.quantile(0.99),
+                    }
+                    for (name, method), h in self.histograms.items()
+                },
+                "counters": {f"{name}/{method}": value for (name, method), value in self.counters.items()},
+            }
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for (name, method), h in sorted(self.histograms.items()):
+                metric = f"bot_{name}_seconds"
+                cumulative = 0
+                for bound, count in zip(h.bounds, h.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f'{metric}_bucket{{method="{method}",le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{method="{method}"}} {h.sum}')
+                lines.append(f'{metric}_count{{method="{method}"}} {h.count}')
+                for q in (0.5, 0.95, 0.99):
+                    lines.append(f'bot_{name}_quantile_seconds{{method="{method}",quantile="{q}"}} {h.quantile(q)}')
+            for (name, method), value in sorted(self.counters.items()):
+                lines.append(f'bot_{name}_total{{method="{method}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Metrics()
+
+
+def serve_metrics(address: str, metrics: Metrics = REGISTRY) -> "ThreadingHTTPServer":
+    # Prometheus text endpoint on http://<address>/metrics, served from a daemon thread.
+    # http.server is imported here to keep it off the startup path when metrics are off
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    host, port = address.rsplit(":", 1)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, int(port)), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+def write_snapshots(path: str, interval: float = 10.0, metrics: Metrics = REGISTRY):
+    # Rewrites `path` with a JSON snapshot every `interval` seconds. Returns a
+    # function that stops the writer after one last snapshot
+    stop = threading.Event()
+
+    def loop():
+        while True:
+            stopped = stop.wait(interval)
+            snapshot = metrics.snapshot()
+            snapshot["time"] = time.time()
+            with open(path + ".tmp", "w") as out:
+                json.dump(snapshot, out)
+            os.replace(path + ".tmp", path)
+            if stopped:
+                return
+
+    thread = threading.Thread(target=loop, name="metrics-snapshot", daemon=True)
+    thread.start()
+
+    def close():
+        stop.set()
+        thread.join()
+
+    return close
@@ -4,56 +4,100 @@ MOVEMENTS = [
     (mi, mj) for mi in (-1, 0, 1) for mj in (-1, 0, 1) if mi or mj
 ]
 
+# Hard cap on expanded search states per call
+MAX_NODES = 4096
+
 def _center_view(view: list[list[int]]):
+    # Row-major flat cells; offset (i, j) from the center lives at
+    # (i + view_distance) * (2 * view_distance + 1) + j + view_distance
     view_distance = len(view) // 2
-    centered_view = {
-        (i - view_distance, j - view_distance): energy
-            for i, row in enumerate(view)
-            for j, energy in enumerate(row)
-    }
-    return centered_view, view_distance
+    cells = [energy for row in view for energy in row]
+    return cells, view_distance
 
 
-def next_move(start: Point, end: Point, view: list[list[int]]):
-    start_i, start_j = start
-    end_i, end_j = end
+def _sign(value: int) -> int:
+    return (value > 0) - (value < 0)
+
+
+def _clamp(value: int, limit: int) -> int:
+    return max(-limit, min(limit, value))
+
+
+def next_move(start: Point, end: Point, view: list[list[int]], extra_turns: int = 1, max_nodes: int = MAX_NODES):
+    cells, view_distance = _center_view(view)
+    return next_move_in_view(start, end, cells, view_distance, extra_turns, max_nodes)
 
-    centered_view, view_distance = _center_view(view)
 
-    rel_end_i = end_i - start_i
-    rel_end_j = end_j - start_j
-    energy, remaining, moves = max(_energy_efficient_path(view_distance, (0, 0), (rel_end_i, rel_end_j), centered_view, 1, 0, ()))
-    return moves[0]
+def relative_target(start: Point, end: Point, view_distance: int) -> Point:
+    # Targets outside the view are projected onto its border
+    return _clamp(end[0] - start[0], view_distance), _clamp(end[1] - start[1], view_distance)
 
-def _energy_efficient_path(
+
+def next_move_in_view(start: Point, end: Point, cells, view_distance: int, extra_turns: int = 1, max_nodes: int = MAX_NODES, deadline=None,
+                      walls: int = 0):
+    # `walls` masks cells the path may not enter, bit (i + view_distance) * side + j + view_distance
+    rel_end = relative_target(start, end, view_distance)
+    return _energy_efficient_move(view_distance, rel_end, cells, extra_turns, max_nodes, deadline, walls)
+
+def _energy_efficient_move(
                            view_distance: int,
-                           start: Point,
                            end: Point,
-                           centered_view: dict[Point, int],
+                           cells,
                            extra_turns: int,
-                           gained_energy: int,
-                           path: tuple[Point, ...]):
-    start_i, start_j = start
+                           max_nodes: int,
+                           deadline=None,
+                           walls: int = 0) -> Point:
+    # Layered DP over (turn, cell): every path reaching the same cell on the
+    # same turn only keeps its best (gained energy, first move), so the search
+    # is bounded by turns * cells instead of the number of paths.
     end_i, end_j = end
+    greedy = (_sign(end_i), _sign(end_j))
+    if end == (0, 0):
+        return greedy
+
+    # Each extra turn allows one step away from the end (and one back)
+    budget = max(abs(end_i), abs(end_j)) + 2 * extra_turns
+    size = 2 * view_distance + 1
+    offset = view_distance * size + view_distance
+    layer = {(0, 0): (0, None)}
+    best = None
+    nodes = 0
+
+    for turns in range(1, budget + 1):
+        # Anytime: return the best path found so far once out of time
+        if deadline is not None and deadline.expired():
+            break
+        # Furthest the next cell may be from the end and still reach it in budget
+        slack = budget - turns
+        next_layer = {}
+        for (i, j), (gained_energy, first_move) in layer.items():
+            # Expanded cells are never on the view edge, so neighbours are in view
+            for mi, mj in MOVEMENTS:
+                next_i, next_j = i + mi, j + mj
+                if abs(end_i - next_i) > slack or abs(end_j - next_j) > slack:
+                    continue
+                cell = offset + next_i * size + next_j
+                if walls and walls >> cell & 1:
+                    continue
+
+                nodes += 1
+                if nodes > max_nodes:
+                    return best[2] if best else greedy
+
+                next_position = next_i, next_j
+                next_energy = gained_energy + cells[cell]
+                move = first_move or (mi, mj)
+                if next_position == end or abs(next_i) == view_distance or abs(next_j) == view_distance:
+                    # Paths stop at the end or at the view edge.
+                    # Earlier turns win ties: max energy, fewest extra turns
+                    result = (next_energy, -turns, move)
+                    if best is None or result > best:
+                        best = result
+                    continue
 
-    if start == end or max(abs(start_i), abs(start_j)) == view_distance:
-        yield gained_energy, -extra_turns, path
-        return
-    
-    di = end_i - start_i
-    dj = end_j - start_j
-    norm_0 = max(abs(di), abs(dj))
-
-    for mi, mj in MOVEMENTS:
-        movement = mi, mj
-        next_i, next_j = start_i + mi, start_j + mj
-        next_position = next_i, next_j
-        if next_position in centered_view:
-            next_norm_0 = max(abs(end_i - next_i), abs(end_j - next_j))
-            next_energy = gained_energy + centered_view[(next_i, next_j)]
-            next_path = path + (movement,)
-            if next_norm_0 <= norm_0:
-                yield from _energy_efficient_path(view_distance, next_position, end, centered_view, extra_turns, next_energy, next_path)
-            elif extra_turns and next_norm_0 == norm_0 + 1:
-                yield from _energy_efficient_path(view_distance, next_position, end, centered_view, extra_turns - 1, next_energy, next_path)
+                current = next_layer.get(next_position)
+                if current is None or (next_energy, move) > current:
+                    next_layer[next_position] = (next_energy, move)
+        layer = next_layer
 
+    return best[2] if best else greedy
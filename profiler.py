@@ -0,0 +1,119 @@
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+
+from botlog import log
+
+SAMPLE_INTERVAL = 0.001
+MAX_STACK_DEPTH = 64
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    # Samples the stacks of registered threads every `interval` seconds from
+    # a daemon thread and counts them as collapsed stacks ("a;b;c" -> n).
+    # With no thread registered it blocks on an event and costs nothing.
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self, ident: int):
+        with self._lock:
+            self._targets[ident] = {}
+            self._wake.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+
+    def stop(self, ident: int) -> dict:
+        with self._lock:
+            stacks = self._targets.pop(ident, {})
+            if not self._targets:
+                self._wake.clear()
+        return stacks
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, stacks in self._targets.items():
+                    frame = frames.get(ident)
+                    if frame is None:
+                        continue
+                    labels = []
+                    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                        labels.append(_frame_label(frame.f_code))
+                        frame = frame.f_back
+                    stack = ";".join(reversed(labels))
+                    stacks[stack] = stacks.get(stack, 0) + 1
+            del frames
+            time.sleep(self.interval)
+
+
+class TurnProfiler:
+    # Opt-in profiling of turn planning. A turn is stack-sampled with
+    # probability `sample_fraction` and run under cProfile with probability
+    # `cprofile_fraction`; when its planning takes longer than `threshold`
+    # seconds whatever was collected is written to `directory` as
+    # turn-<n>-<size>B-<ms>ms.collapsed (for flamegraph tools) and .pstats.
+    # Turns that draw neither only pay for two clock reads and a random().
+    def __init__(self, directory: str, threshold: float = 0.5, sample_fraction: float = 1.0,
+                 cprofile_fraction: float = 0.0, interval: float = SAMPLE_INTERVAL, rng=None):
+        self.directory = directory
+        self.threshold = threshold
+        self.sample_fraction = sample_fraction
+        self.cprofile_fraction = cprofile_fraction
+        self.sampler = StackSampler(interval)
+        # A private RNG keeps the global seed of recorded games untouched
+        self.rng = rng or random.Random()
+        self.slow_turns = 0
+        self.dumps = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def wrap(self, plan, turn_number: int, state_size: int):
+        # Returns `plan` instrumented for this turn; it runs on the planner thread
+        def profiled(*args):
+            sample = self.rng.random() < self.sample_fraction
+            profile = cProfile.Profile() if self.rng.random() < self.cprofile_fraction else None
+            ident = threading.get_ident()
+            if sample:
+                self.sampler.start(ident)
+            if profile:
+                profile.enable()
+            start_time = time.perf_counter()
+            try:
+                return plan(*args)
+            finally:
+                elapsed = time.perf_counter() - start_time
+                if profile:
+                    profile.disable()
+                stacks = self.sampler.stop(ident) if sample else None
+                if elapsed > self.threshold:
+                    self._slow_turn(turn_number, state_size, elapsed, stacks, profile)
+
+        return profiled
+
+    def _slow_turn(self, turn_number, state_size, elapsed, stacks, profile):
+        self.slow_turns += 1
+        if not stacks and profile is None:
+            log.warning("Turn %s took %.0f ms (not profiled)", turn_number, elapsed * 1e3)
+            return
+        base = os.path.join(self.directory, f"turn-{turn_number}-{state_size}B-{elapsed * 1e3:.0f}ms")
+        if stacks:
+            with open(base + ".collapsed", "w") as out:
+                for stack, count in sorted(stacks.items()):
+                    out.write(f"{stack} {count}\n")
+        if profile is not None:
+            profile.dump_stats(base + ".pstats")
+        self.dumps += 1
+        log.warning("Turn %s took %.0f ms, profile written to %s.*", turn_number, elapsed * 1e3, base)
@@ -0,0 +1,223 @@
+import argparse
+import mmap
+import os
+import random
+import threading
+import time
+from array import array
+
+from history import _decode_varint, _encode_varint
+from internal.handler.coms import game_pb2
+
+MAGIC = b"LHREC\x01"
+HEADER_SIZE = len(MAGIC) + 8
+
+# Record kinds, one byte in front of every length-delimited payload
+INITIAL_STATE = 1
+TURN = 2
+ACTION = 3
+
+MESSAGE_TYPES = {
+    INITIAL_STATE: game_pb2.NewPlayerInitialState,
+    TURN: game_pb2.NewTurn,
+    ACTION: game_pb2.NewAction,
+}
+
+
+class GameRecorder:
+    # Appends every InitialState/Turn request and the NewAction sent back to
+    # `path` as <kind><varint length><payload> records after a header holding
+    # the RNG seed. The byte offset of each record goes to `path`.idx as a
+    # uint64, so a replay can jump to any turn without scanning the log.
+    def __init__(self, path: str, seed: int = None):
+        self.path = path
+        self.seed = random.randrange(1 << 63) if seed is None else seed
+        # The bot draws from the global RNG; seed it so replays take the same choices
+        random.seed(self.seed)
+        self._lock = threading.Lock()
+        self._log = open(path, "wb")
+        self._index = open(path + ".idx", "wb")
+        self._log.write(MAGIC + self.seed.to_bytes(8, "little"))
+        self._offset = HEADER_SIZE
+
+    def initial_state(self, state: game_pb2.NewPlayerInitialState):
+        self._write(INITIAL_STATE, state)
+        self.flush()
+
+    def turn(self, turn: game_pb2.NewTurn, action: game_pb2.NewAction):
+        self._write(TURN, turn)
+        self._write(ACTION, action)
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            if self._log:
+                self._log.flush()
+                self._index.flush()
+
+    def close(self):
+        with self._lock:
+            if self._log:
+                self._log.close()
+                self._index.close()
+                self._log = self._index = None
+
+    def _write(self, kind: int, message):
+        payload = message.SerializeToString()
+        record = bytes((kind,)) + _encode_varint(len(payload)) + payload
+        with self._lock:
+            if not self._log:
+                return
+            self._log.write(record)
+            self._index.write(self._offset.to_bytes(8, "little"))
+            self._offset += len(record)
+
+
+class GameLog:
+    # Read-only view of a GameRecorder log through mmap. Records are decoded
+    # on access; the offset index is rebuilt by scanning when the .idx file
+    # is missing or was cut short.
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a game recording")
+        self.seed = int.from_bytes(self._data[len(MAGIC):HEADER_SIZE], "little")
+        self.offsets = self._load_index()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index: int):
+        kind, start, end = self._record(self.offsets[index])
+        return kind, MESSAGE_TYPES[kind].FromString(self._data[start:end])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def kind(self, index: int) -> int:
+        return self._data[self.offsets[index]]
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+    def _record(self, offset: int):
+        size, start = _decode_varint(self._data, offset + 1)
+        return self._data[offset], start, start + size
+
+    def _end(self, offset: int):
+        # End of the record at `offset`, or None if it was not completely written
+        if offset >= len(self._data):
+            return None
+        try:
+            end = self._record(offset)[2]
+        except IndexError:
+            return None
+        return end if end <= len(self._data) else None
+
+    def _load_index(self) -> array:
+        offsets = array("Q")
+        index_path = self.path + ".idx"
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                raw = f.read()
+            offsets.frombytes(raw[:len(raw) - len(raw) % 8])
+            # Keep only records that were completely written
+            while offsets and self._end(offsets[-1]) is None:
+                offsets.pop()
+        offset = self._end(offsets[-1]) if offsets else HEADER_SIZE
+        while True:
+            end = self._end(offset)
+            if end is None:
+                break
+            offsets.append(offset)
+            offset = end
+        return offsets
+
+
+class ReplayedTurn:
+    __slots__ = ("turn", "seconds", "recorded", "replayed")
+
+    def __init__(self, turn, seconds, recorded, replayed):
+        self.turn = turn
+        self.seconds = seconds
+        self.recorded = recorded
+        self.replayed = replayed
+
+    @property
+    def matches(self) -> bool:
+        return self.recorded == self.replayed
+
+
+def replay(log: GameLog, bot=None):
+    # Feeds the recorded requests to a fresh BotGame (or `bot`) as fast as it
+    # answers them, with the recording's RNG seed, and yields a ReplayedTurn
+    # per turn pairing the recorded action with the one chosen now
+    if bot is None:
+        import main
+        bot = main.BotGame()
+    random.seed(log.seed)
+
+    turn_number = 0
+    replayed = seconds = None
+    for kind, message in log:
+        if kind == INITIAL_STATE:
+            bot.load_initial_state(message)
+        elif kind == TURN:
+            start_time = time.perf_counter()
+            replayed = bot.new_turn_action(message)
+            seconds = time.perf_counter() - start_time
+        elif kind == ACTION and replayed is not None:
+            yield ReplayedTurn(turn_number, seconds, message, replayed)
+            turn_number += 1
+            replayed = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded game through BotGame")
+    parser.add_argument("path", help="Recording written with main.py --record")
+    parser.add_argument("--slowest", type=int, default=5, help="Number of slowest turns to list")
+    parser.add_argument("--profile", action="store_true", help="Run the replay under cProfile")
+    args = parser.parse_args()
+
+    from main import BotGame
+
+    with GameLog(args.path) as log:
+        bot = BotGame()
+        if args.profile:
+            import cProfile
+            import pstats
+            profiler = cProfile.Profile()
+            turns = profiler.runcall(lambda: list(replay(log, bot)))
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+        else:
+            turns = list(replay(log, bot))
+
+    if not turns:
+        print("No turns recorded")
+        return
+    timings = sorted(t.seconds for t in turns)
+    mismatches = [t.turn for t in turns if not t.matches]
+    print(f"turns: {len(turns)}")
+    print(f"total: {sum(timings) * 1e3:.1f} ms")
+    for label, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+        print(f"{label}: {timings[min(len(timings) - 1, int(q * len(timings)))] * 1e3:.3f} ms")
+    print(f"max: {timings[-1] * 1e3:.3f} ms")
+    print(f"actions differing from the recording: {len(mismatches)}"
+          + (f" (first at turn {mismatches[0]})" if mismatches else ""))
+    for t in sorted(turns, key=lambda t: t.seconds, reverse=True)[:args.slowest]:
+        print(f"turn {t.turn}: {t.seconds * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
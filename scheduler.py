@@ -0,0 +1,179 @@
+import asyncio
+import threading
+import time
+from concurrent import futures
+
+from botlog import log
+
+# Time kept back from the RPC deadline to serialize and send the response
+SAFETY_MARGIN = 0.05
+
+
+class Deadline:
+    # A point in time plus a cancellation flag shared with its slices, so
+    # cancelling a turn's deadline makes every planner working under it see
+    # it expired at its next check.
+    __slots__ = ("expires_at", "_cancelled")
+
+    def __init__(self, expires_at: float, cancelled: list = None):
+        self.expires_at = expires_at
+        self._cancelled = cancelled if cancelled is not None else [False]
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    @classmethod
+    def from_context(cls, context, default_budget: float, safety_margin: float = SAFETY_MARGIN) -> "Deadline":
+        # time_remaining() is None when the caller did not set a deadline
+        remaining = context.time_remaining() if context is not None else None
+        if remaining is None:
+            remaining = default_budget
+        return cls.after(max(0.0, remaining - safety_margin))
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled[0]
+
+    def cancel(self):
+        self._cancelled[0] = True
+
+    def remaining(self) -> float:
+        if self._cancelled[0]:
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self._cancelled[0] or time.monotonic() >= self.expires_at
+
+    def slice(self, fraction: float) -> "Deadline":
+        now = time.monotonic()
+        return Deadline(now + max(0.0, self.expires_at - now) * fraction, self._cancelled)
+
+
+class TurnScheduler:
+    # Runs the turn planner on a dedicated thread and waits for it only until
+    # the deadline. Planners get the Deadline and are expected to return their
+    # best action so far once it expires; if one overruns anyway, the fallback
+    # action is answered instead and the late result is dropped.
+    #
+    # Turns of a game are sequenced: a new turn cancels the deadline of the
+    # one still in flight (as does the engine dropping the call), so the
+    # stale plan stops at its next deadline check, and one that has not
+    # started yet is skipped. `commit(action)` records the turn's outcome
+    # and `discard()` undoes a plan whose turn was abandoned; both run on
+    # the planner thread right after the plan, so the game state is only
+    # ever touched from that thread and never by an abandoned turn.
+    def __init__(self, default_budget: float, safety_margin: float = SAFETY_MARGIN):
+        self.default_budget = default_budget
+        self.safety_margin = safety_margin
+        self.overruns = 0
+        self.superseded = 0
+        self._current = None
+        self._lock = threading.Lock()
+        self._executor = futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="planner")
+
+    def deadline(self, context) -> Deadline:
+        return Deadline.from_context(context, self.default_budget, self.safety_margin)
+
+    def begin(self, context) -> Deadline:
+        # Deadline of a new turn, superseding the turn in flight if any
+        deadline = self.deadline(context)
+        with self._lock:
+            if self._current is not None:
+                self._current.cancel()
+                self.superseded += 1
+            self._current = deadline
+        return deadline
+
+    def run(self, context, plan, fallback, commit=None, discard=None):
+        deadline = self.begin(context)
+        if context is not None:
+            # Called when the RPC ends, also when the engine cancels it
+            context.add_callback(deadline.cancel)
+        future = self._executor.submit(self._execute, plan, fallback, deadline, commit, discard)
+        try:
+            return self._answer(future.result(timeout=deadline.remaining()), fallback)
+        except futures.TimeoutError:
+            return self._overrun(future, deadline, fallback, commit)
+        except Exception:
+            log.exception("Turn planning failed, answering the fallback action")
+            return fallback()
+
+    async def run_async(self, context, plan, fallback, commit=None, discard=None):
+        # Same as run() for asyncio servers: the event loop stays free while
+        # the planner thread works
+        deadline = self.begin(context)
+        future = asyncio.get_running_loop().run_in_executor(
+            self._executor, self._execute, plan, fallback, deadline, commit, discard
+        )
+        try:
+            # shield: a late plan is stopped through its deadline instead
+            action = await asyncio.wait_for(asyncio.shield(future), deadline.remaining())
+        except asyncio.TimeoutError:
+            return self._overrun(future, deadline, fallback, commit)
+        except asyncio.CancelledError:
+            # The engine cancelled the call
+            deadline.cancel()
+            raise
+        except Exception:
+            log.exception("Turn planning failed, answering the fallback action")
+            return fallback()
+        return self._answer(action, fallback)
+
+    def _execute(self, plan, fallback, deadline, commit, discard):
+        # On the planner thread; None means the turn was abandoned. A planner
+        # that fails or gives no action is answered (and recorded) with the
+        # fallback action
+        if deadline.cancelled:
+            if discard:
+                discard()
+            return None
+        try:
+            action = plan(deadline)
+        except Exception:
+            log.exception("Turn planner failed, answering the fallback action")
+            action = None
+        if action is None:
+            action = fallback()
+        with self._lock:
+            if self._current is deadline:
+                self._current = None
+            if deadline.cancelled:
+                action = None
+            elif commit:
+                commit(action)
+        if action is None and discard:
+            discard()
+        return action
+
+    @staticmethod
+    def _answer(action, fallback):
+        # An abandoned turn still gets an answer, but nothing is recorded
+        return action if action is not None else fallback()
+
+    def _overrun(self, future, deadline, fallback, commit):
+        with self._lock:
+            if future.done():
+                # Finished, and committed or discarded, as we gave up on it
+                return self._answer(None if future.exception() else future.result(), fallback)
+            late = not deadline.cancelled
+            deadline.cancel()
+            if self._current is deadline:
+                self._current = None
+            action = fallback()
+            if late:
+                self.overruns += 1
+                if commit:
+                    # The fallback is this turn's outcome. Queued behind the
+                    # late plan, which now commits nothing, and ahead of any
+                    # later turn
+                    self._executor.submit(commit, action)
+        return action
+
+    async def call_async(self, fn, *args):
+        # Other CPU-heavy work (e.g. loading the initial state) on the planner thread
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,350 @@
+import argparse
+import random
+import threading
+import time
+from array import array
+from concurrent import futures
+
+import grpc
+
+from energymap import MAX_CELL_ENERGY, regeneration
+from geometry import ConnectionIndex, TriangleCoverage, bits
+from internal.handler.coms import game_pb2
+from internal.handler.coms import game_pb2_grpc as game_grpc
+from pathfinding import MOVEMENTS
+
+VIEW_RADIUS = 3
+LIGHTHOUSE_DECAY = 10
+LIGHTHOUSE_POINTS = 2
+LINK_POINTS = 2
+
+
+def make_map(size: int, wall_ratio: float = 0.1, rng=random):
+    # Island with border walls and scattered inner walls, rows as Map[y][x]
+    return [
+        [0 if x in (0, size - 1) or y in (0, size - 1) or rng.random() < wall_ratio else 1 for x in range(size)]
+        for y in range(size)
+    ]
+
+
+def place_lighthouses(rows, count: int, rng=random):
+    cells = [(x, y) for y, row in enumerate(rows) for x, cell in enumerate(row) if cell]
+    return rng.sample(cells, min(count, len(cells)))
+
+
+def generate_map(size: int = 15, lighthouses: int = 8, wall_ratio: float = 0.1, rng=random):
+    rows = make_map(size, wall_ratio, rng)
+    return rows, place_lighthouses(rows, lighthouses, rng)
+
+
+class PlayerState:
+    __slots__ = ("id", "name", "bot", "position", "energy", "score", "keys", "invalid_actions")
+
+    def __init__(self, player_id, name, bot, position):
+        self.id = player_id
+        self.name = name
+        self.bot = bot
+        self.position = position
+        self.energy = 0
+        self.score = 0
+        self.keys = set()
+        self.invalid_actions = 0
+
+
+class StubPlayer:
+    # Servicer-like adapter that forwards to a bot over gRPC
+    def __init__(self, address: str, timeout: float = 1.0):
+        self.channel = grpc.insecure_channel(address)
+        self.stub = game_grpc.GameServiceStub(self.channel)
+        self.timeout = timeout
+
+    def InitialState(self, request, context=None):
+        return self.stub.InitialState(request, timeout=self.timeout)
+
+    def Turn(self, request, context=None):
+        return self.stub.Turn(request, timeout=self.timeout)
+
+
+class Simulation:
+    # Headless implementation of the Lighthouses rules. Players are anything
+    # with the servicer's InitialState(request, context) and
+    # Turn(request, context) methods: a ClientServer called in-process, or a
+    # StubPlayer talking to a bot over gRPC. Lighthouse owners use player
+    # IDs starting at 1, with 0 meaning nobody.
+    def __init__(self, rows, lighthouses, bots, names=None, rng=None, view_radius=VIEW_RADIUS):
+        self.rng = rng or random.Random()
+        self.rows = rows
+        self.height = len(rows)
+        self.width = max(len(row) for row in rows)
+        self.playable = bytearray(self.width * self.height)
+        for y, row in enumerate(rows):
+            for x, cell in enumerate(row):
+                if cell:
+                    self.playable[y * self.width + x] = 1
+        self.view_radius = view_radius
+
+        self.lighthouses = list(lighthouses)
+        self.lighthouse_index = {pos: i for i, pos in enumerate(self.lighthouses)}
+        self.owners = array("i", bytes(4 * len(self.lighthouses)))
+        self.lighthouse_energy = array("i", bytes(4 * len(self.lighthouses)))
+        self.connections = [0] * len(self.lighthouses)
+        self.legality = ConnectionIndex(self.lighthouses)
+        self.coverage = TriangleCoverage(self.lighthouses, self.width, self.height, self.playable, self.legality)
+
+        # Static per-cell regeneration, the same the bot predicts: the
+        # simulation has the GameMap fields it reads
+        self.regen = regeneration(self)
+        self.energy = array("i", bytes(4 * len(self.playable)))
+
+        starts = [pos for pos in self.lighthouses] or [
+            (idx % self.width, idx // self.width) for idx, cell in enumerate(self.playable) if cell
+        ]
+        names = names or [f"bot{i + 1}" for i in range(len(bots))]
+        self.players = [
+            PlayerState(i + 1, name, bot, self.rng.choice(starts))
+            for i, (name, bot) in enumerate(zip(names, bots))
+        ]
+        self.round = 0
+        self.turns = 0
+
+    def start(self):
+        map_rows = [game_pb2.MapRow(Row=row) for row in self.rows]
+        for player in self.players:
+            state = game_pb2.NewPlayerInitialState(
+                PlayerID=player.id,
+                PlayerCount=len(self.players),
+                Position=game_pb2.Position(X=player.position[0], Y=player.position[1]),
+                Map=map_rows,
+                Lighthouses=self._lighthouse_messages(player),
+            )
+            player.bot.InitialState(state, None)
+
+    def step(self):
+        self.round += 1
+        self._regenerate()
+        for player in self.players:
+            action = player.bot.Turn(self._turn_message(player), None)
+            if not self._apply(player, action):
+                player.invalid_actions += 1
+            self.turns += 1
+        self._score()
+
+    def run(self, rounds: int) -> dict:
+        self.start()
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            self.step()
+        elapsed = time.perf_counter() - start_time
+        return {
+            "rounds": self.round,
+            "turns": self.turns,
+            "turns_per_second": self.turns / elapsed if elapsed else 0.0,
+            "players": [
+                {"id": p.id, "name": p.name, "score": p.score, "invalid_actions": p.invalid_actions}
+                for p in self.players
+            ],
+        }
+
+    def _regenerate(self):
+        # Cells regrow around lighthouses, players harvest where they stand,
+        # lighthouses decay and are lost when they run out of energy
+        energy, regen = self.energy, self.regen
+        for idx, amount in enumerate(regen):
+            if amount:
+                energy[idx] = min(MAX_CELL_ENERGY, energy[idx] + amount)
+
+        standing = {}
+        for player in self.players:
+            standing.setdefault(player.position, []).append(player)
+        for (x, y), players in standing.items():
+            idx = y * self.width + x
+            share = energy[idx] // len(players)
+            for player in players:
+                player.energy += share
+            energy[idx] = 0
+            if (x, y) in self.lighthouse_index:
+                for player in players:
+                    player.keys.add(self.lighthouse_index[x, y])
+
+        for i, lh_energy in enumerate(self.lighthouse_energy):
+            if lh_energy:
+                lh_energy = max(0, lh_energy - LIGHTHOUSE_DECAY)
+                self.lighthouse_energy[i] = lh_energy
+                if not lh_energy:
+                    self._set_owner(i, 0)
+
+    def _apply(self, player, action) -> bool:
+        x, y = player.position
+        dest = (action.Destination.X, action.Destination.Y)
+        if action.Action == game_pb2.PASS:
+            return True
+
+        if action.Action == game_pb2.MOVE:
+            dx, dy = dest[0] - x, dest[1] - y
+            if (dx, dy) not in MOVEMENTS or not self._is_playable(dest):
+                return False
+            player.position = dest
+            return True
+
+        current = self.lighthouse_index.get((x, y))
+        if current is None:
+            return False
+
+        if action.Action == game_pb2.ATTACK:
+            spent = action.Energy
+            if spent < 0 or spent > player.energy:
+                return False
+            player.energy -= spent
+            if self.owners[current] == player.id:
+                self.lighthouse_energy[current] += spent
+            else:
+                remaining = self.lighthouse_energy[current] - spent
+                if remaining < 0:
+                    self._set_owner(current, player.id)
+                    self.lighthouse_energy[current] = -remaining
+                else:
+                    self.lighthouse_energy[current] = remaining
+                    if not remaining:
+                        self._set_owner(current, 0)
+            return True
+
+        if action.Action == game_pb2.CONNECT:
+            target = self.lighthouse_index.get(dest)
+            if (
+                    target is None or
+                    self.owners[current] != player.id or
+                    self.owners[target] != player.id or
+                    target not in player.keys or
+                    not self.legality.is_legal(current, target)
+            ):
+                return False
+            player.keys.discard(target)
+            self.connections[current] |= 1 << target
+            self.connections[target] |= 1 << current
+            self.legality.apply([(current, target)], [])
+            return True
+
+        return False
+
+    def _score(self):
+        for player in self.players:
+            owned = [i for i, owner in enumerate(self.owners) if owner == player.id]
+            links = sum((self.connections[i] & ~((2 << i) - 1)).bit_count() for i in owned)
+            cells = self.coverage.covered(owned, self.connections).bit_count()
+            player.score += LIGHTHOUSE_POINTS * len(owned) + LINK_POINTS * links + cells
+
+    def _set_owner(self, i: int, owner: int):
+        if self.owners[i] == owner:
+            return
+        self.owners[i] = owner
+        # Changing hands drops every link of the lighthouse
+        removed = []
+        for j in bits(self.connections[i]):
+            self.connections[j] &= ~(1 << i)
+            removed.append((i, j))
+        self.connections[i] = 0
+        self.legality.apply([], removed)
+
+    def _is_playable(self, pos) -> bool:
+        x, y = pos
+        return 0 <= x < self.width and 0 <= y < self.height and bool(self.playable[y * self.width + x])
+
+    def _lighthouse_messages(self, player):
+        messages = []
+        for i, (x, y) in enumerate(self.lighthouses):
+            links = [
+                game_pb2.Position(X=self.lighthouses[j][0], Y=self.lighthouses[j][1])
+                for j in bits(self.connections[i])
+            ]
+            messages.append(game_pb2.Lighthouse(
+                Position=game_pb2.Position(X=x, Y=y),
+                Owner=self.owners[i],
+                Energy=self.lighthouse_energy[i],
+                Connections=links,
+                HaveKey=i in player.keys,
+            ))
+        return messages
+
+    def _turn_message(self, player):
+        # View rows are indexed by X offset, as pathfinding reads them
+        x, y = player.position
+        radius = self.view_radius
+        view = []
+        for vx in range(x - radius, x + radius + 1):
+            row = []
+            for vy in range(y - radius, y + radius + 1):
+                inside = 0 <= vx < self.width and 0 <= vy < self.height
+                row.append(self.energy[vy * self.width + vx] if inside else 0)
+            view.append(game_pb2.MapRow(Row=row))
+        return game_pb2.NewTurn(
+            Position=game_pb2.Position(X=x, Y=y),
+            Score=player.score,
+            Energy=player.energy,
+            View=view,
+            Lighthouses=self._lighthouse_messages(player),
+        )
+
+
+class GameEngine(game_grpc.GameServiceServicer):
+    # Local engine stand-in: bots Join over gRPC as with the real engine and
+    # are then played through StubPlayer once `players` have joined
+    def __init__(self, players: int, rows, lighthouses, rounds: int, rng=None, timeout: float = 1.0):
+        self.expected = players
+        self.rows = rows
+        self.lighthouses = lighthouses
+        self.rounds = rounds
+        self.rng = rng
+        self.timeout = timeout
+        self.joined = []
+        self.result = None
+        self._ready = threading.Event()
+
+    def Join(self, request, context):
+        if len(self.joined) >= self.expected:
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Game is full")
+        self.joined.append((request.name, request.serverAddress))
+        if len(self.joined) == self.expected:
+            self._ready.set()
+        return game_pb2.PlayerID(PlayerID=len(self.joined))
+
+    def play(self, wait: float = None) -> dict:
+        if not self._ready.wait(wait):
+            raise TimeoutError("Not enough players joined")
+        bots = [StubPlayer(address, self.timeout) for _, address in self.joined]
+        names = [name for name, _ in self.joined]
+        simulation = Simulation(self.rows, self.lighthouses, bots, names=names, rng=self.rng)
+        self.result = simulation.run(self.rounds)
+        return self.result
+
+
+def serve_engine(engine: GameEngine, address: str) -> grpc.Server:
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    game_grpc.add_GameServiceServicer_to_server(engine, server)
+    server.add_insecure_port(address)
+    server.start()
+    return server
+
+
+def main():
+    import json
+
+    import main as bot
+
+    parser = argparse.ArgumentParser(description="Play BotGame against itself without the engine")
+    parser.add_argument("--players", type=int, default=2)
+    parser.add_argument("--size", type=int, default=15)
+    parser.add_argument("--lighthouses", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    rows, lighthouses = generate_map(args.size, args.lighthouses, rng=rng)
+    bots = [bot.ClientServer(bot_id=i + 1) for i in range(args.players)]
+    result = Simulation(rows, lighthouses, bots, rng=rng).run(args.rounds)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+from array import array
+
+from pathfinding import Point
+
+
+class TurnSnapshot:
+    # Decoded view of a NewTurn. Lighthouses are addressed by index; the
+    # position index is shared between turns while the lighthouse set stays
+    # the same, and connections are kept as one adjacency bitmask per
+    # lighthouse, decoded from the protobuf the first time they are read.
+    __slots__ = (
+        "position", "energy", "score",
+        "view", "view_distance",
+        "positions", "index", "owners", "energies", "keys", "link_counts",
+        "_raw_connections", "_connections",
+    )
+
+    def __init__(self, position: Point, energy: int, score: int,
+                 view: array, view_distance: int,
+                 positions: list[Point], index: dict[Point, int],
+                 owners: array, energies: array, keys: bytearray, link_counts: array,
+                 raw_connections: list):
+        self.position = position
+        self.energy = energy
+        self.score = score
+        self.view = view
+        self.view_distance = view_distance
+        self.positions = positions
+        self.index = index
+        self.owners = owners
+        self.energies = energies
+        self.keys = keys
+        self.link_counts = link_counts
+        self._raw_connections = raw_connections
+        self._connections = [None] * len(positions)
+
+    @classmethod
+    def decode(cls, turn, previous: "TurnSnapshot" = None) -> "TurnSnapshot":
+        position = turn.Position
+        view_rows = turn.View
+        view = array("i")
+        for row in view_rows:
+            view.extend(row.Row)
+
+        lighthouses = turn.Lighthouses
+        count = len(lighthouses)
+        positions = []
+        owners = array("i", bytes(4 * count))
+        energies = array("i", bytes(4 * count))
+        keys = bytearray(count)
+        link_counts = array("i", bytes(4 * count))
+        raw_connections = []
+        for i, lh in enumerate(lighthouses):
+            lh_position = lh.Position
+            positions.append((lh_position.X, lh_position.Y))
+            owners[i] = lh.Owner
+            energies[i] = lh.Energy
+            keys[i] = lh.HaveKey
+            links = lh.Connections
+            link_counts[i] = len(links)
+            raw_connections.append(links)
+
+        if previous is not None and previous.positions == positions:
+            positions = previous.positions
+            index = previous.index
+        else:
+            index = {pos: i for i, pos in enumerate(positions)}
+
+        return cls(
+            (position.X, position.Y), turn.Energy, turn.Score,
+            view, len(view_rows) // 2,
+            positions, index, owners, energies, keys, link_counts, raw_connections,
+        )
+
+    def lighthouse_at(self, pos: Point):
+        return self.index.get(pos)
+
+    def connection_mask(self, i: int) -> int:
+        mask = self._connections[i]
+        if mask is None:
+            mask = 0
+            index = self.index
+            for link in self._raw_connections[i]:
+                j = index.get((link.X, link.Y))
+                if j is not None:
+                    mask |= 1 << j
+            self._connections[i] = mask
+        return mask
+
+    def is_connected(self, i: int, j: int) -> bool:
+        return bool(self.connection_mask(i) >> j & 1)
+
+    def owned_by(self, player: int) -> list[int]:
+        return [i for i, owner in enumerate(self.owners) if owner == player]
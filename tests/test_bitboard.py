@@ -0,0 +1,41 @@
+import random
+
+from gamemap import GameMap
+from pathfinding import MOVEMENTS
+
+
+def random_map(width, height, seed):
+    rng = random.Random(seed)
+    rows = [[0 if rng.random() < 0.3 else 1 for _ in range(width)] for _ in range(height)]
+    return GameMap(rows, [])
+
+
+def test_moves_lead_to_playable_cells():
+    game_map = random_map(9, 7, 0)
+    board = game_map.bitboard
+    for y in range(-1, game_map.height + 1):
+        for x in range(-1, game_map.width + 1):
+            expected = tuple(
+                (dx, dy) for dx, dy in MOVEMENTS
+                if 0 <= x < game_map.width and 0 <= y < game_map.height and game_map.is_playable((x + dx, y + dy))
+            )
+            assert board.moves((x, y)) == expected
+            near = (x + 2, y - 1)
+            assert board.moves((x, y), near=near) == tuple(
+                (dx, dy) for dx, dy in expected if abs(near[0] - x - dx) <= 1 and abs(near[1] - y - dy) <= 1
+            )
+
+
+def test_window_marks_walls_and_off_map_cells():
+    game_map = random_map(8, 11, 1)
+    board = game_map.bitboard
+    for radius in (1, 3):
+        side = 2 * radius + 1
+        for y in range(game_map.height):
+            for x in range(game_map.width):
+                expected = 0
+                for dx in range(-radius, radius + 1):
+                    for dy in range(-radius, radius + 1):
+                        if not game_map.is_playable((x + dx, y + dy)):
+                            expected |= 1 << ((dx + radius) * side + dy + radius)
+                assert board.window((x, y), radius) == expected
@@ -0,0 +1,37 @@
+from array import array
+
+import main
+from benchmarks.synthetic import make_initial_state
+from energymap import NEVER_SEEN, EnergyMap
+from gamemap import GameMap
+from internal.handler.coms import game_pb2
+
+
+def test_turns_without_view_keep_the_grid():
+    state = make_initial_state(size=15)
+    bot = main.BotGame(1)
+    bot.load_initial_state(state)
+    size = len(bot.energy_map.energy)
+    for _ in range(3):
+        turn = game_pb2.NewTurn(Position=state.Position, Energy=10)
+        bot.record_action(turn, bot.plan_action(turn))
+    assert len(bot.energy_map.energy) == len(bot.energy_map.seen) == len(bot.energy_map.regen) == size
+    assert bot.energy_map.turn == 2
+
+
+def test_view_at_the_map_edge_writes_only_cells_on_the_map():
+    state = make_initial_state(size=15)
+    energy_map = EnergyMap(GameMap.from_initial_state(state))
+    width = energy_map.width
+    # View of radius 1 centered on the corner (0, 0), row dx holding (dx, dy)
+    view = array("i", [10 * (dx + 1) + dy + 1 for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+    energy_map.update(4, (0, 0), view, 1)
+    assert len(energy_map.energy) == width * energy_map.height
+    assert [energy_map.energy[y * width + x] for x in (0, 1) for y in (0, 1)] == [11, 12, 21, 22]
+    assert energy_map.seen[0] == energy_map.seen[width + 1] == 4
+    assert energy_map.seen[2] == NEVER_SEEN
+
+    # A view shorter than its radius implies is ignored
+    energy_map.update(5, (3, 3), view[:5], 1)
+    assert len(energy_map.energy) == width * energy_map.height
+    assert energy_map.seen[3 * width + 3] == NEVER_SEEN
@@ -0,0 +1,30 @@
+from history import read_stream
+from internal.handler.coms import game_pb2
+from main import BotComs, ClientServer, GameHost
+
+
+def test_hosted_games_stream_to_their_own_files_and_close_them(tmp_path):
+    host = GameHost(factory=ClientServer, max_games=1, history_path=str(tmp_path / "turns.bin"))
+    first = host.game("a")
+    turn, action = game_pb2.NewTurn(Energy=7), game_pb2.NewAction(Action=game_pb2.PASS)
+    first.bg.turn_states.append(turn, action)
+    # A second game evicts the first, which must release its file
+    second = host.game("b")
+    assert first.bg.turn_states._stream is None
+    host.close()
+    assert second.bg.turn_states._stream is None
+
+    assert list(read_stream(str(tmp_path / "turns-0.bin"))) == [(turn, action)]
+    assert list(read_stream(str(tmp_path / "turns-1.bin"))) == []
+
+
+def test_single_game_closes_its_history(tmp_path):
+    path = str(tmp_path / "turns.bin")
+    bot = BotComs("bot", "localhost:0", None, history_path=path)
+    bot.servicers = bot._servicers()
+    (_, servicer), = bot.servicers
+    turn, action = game_pb2.NewTurn(Energy=3), game_pb2.NewAction(Action=game_pb2.PASS)
+    servicer.bg.turn_states.append(turn, action)
+    bot._close()
+    assert servicer.bg.turn_states._stream is None
+    assert list(read_stream(path)) == [(turn, action)]
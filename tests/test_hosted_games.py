@@ -0,0 +1,69 @@
+import asyncio
+
+import grpc
+import pytest
+
+import main
+from internal.handler.coms import game_pb2
+
+
+class Aborted(Exception):
+    pass
+
+
+class Context:
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.code = None
+
+    def invocation_metadata(self):
+        return self.metadata
+
+    def abort(self, code, details):
+        self.code = code
+        raise Aborted(details)
+
+
+class AsyncContext(Context):
+    async def abort(self, code, details):
+        Context.abort(self, code, details)
+
+
+def test_non_numeric_player_id_is_an_invalid_argument():
+    host = main.GameHost()
+    servicer = main.HostedGames(host, "localhost:0")
+    context = Context((("game-id", "g"), ("player-id", "one")))
+    with pytest.raises(Aborted):
+        servicer.Turn(game_pb2.NewTurn(), context)
+    assert context.code == grpc.StatusCode.INVALID_ARGUMENT
+    assert not host.games
+    host.close()
+
+
+def test_non_numeric_player_id_is_an_invalid_argument_aio():
+    host = main.GameHost(factory=main.AsyncClientServer)
+    servicer = main.AsyncHostedGames(host, "localhost:0")
+    context = AsyncContext((("game-id", "g"), ("player-id", "one")))
+    with pytest.raises(Aborted):
+        asyncio.run(servicer.Turn(game_pb2.NewTurn(), context))
+    assert context.code == grpc.StatusCode.INVALID_ARGUMENT
+    host.close()
+
+
+def test_join_rejects_mismatched_game_servers():
+    bot = main.BotComs("bot", "localhost:3001,localhost:3002,localhost:3003", "game:50051,game:50052")
+    with pytest.raises(ValueError):
+        bot.wait_to_join_game()
+    assert bot.bot_ids == {}
+
+
+def test_payload_sampling_reaches_every_game():
+    host = main.GameHost(verbose=True, payload_every=10)
+    game = host.game("a")
+    assert game.verbose and game.payload_sampler.every == 10
+    host.close()
+
+    bot = main.BotComs("bot", "localhost:0", None, verbose=True, payload_every=5)
+    (_, servicer), = bot._servicers()
+    assert servicer.verbose and servicer.payload_sampler.every == 5
+    servicer.close()
@@ -0,0 +1,34 @@
+import pickle
+import random
+
+import main
+import mcts
+from benchmarks.synthetic import make_initial_state, make_turn
+from mapcache import MapCache
+from scheduler import Deadline
+
+
+def test_warm_cache_with_process_planner(tmp_path):
+    rng = random.Random(3)
+    state = make_initial_state(size=20, lighthouses=8, rng=rng)
+    positions = [(lh.Position.X, lh.Position.Y) for lh in state.Lighthouses]
+    cache = MapCache(str(tmp_path))
+    # Cold: computes and stores the artifacts
+    main.BotGame(1, map_cache=cache).load_initial_state(state)
+    assert cache.misses == 1
+
+    planner = mcts.MctsPlanner(workers=1)
+    try:
+        bot = main.BotGame(1, planner=planner, map_cache=cache)
+        bot.load_initial_state(state)
+        assert cache.hits == 1
+        # The energy map is shipped to the worker processes with every search
+        copy = pickle.loads(pickle.dumps(bot.energy_map))
+        assert list(copy.regen) == list(bot.energy_map.regen)
+        for _ in range(3):
+            turn = make_turn(positions=positions, size=20, rng=rng)
+            # Called directly, so a worker failure raises instead of falling back
+            bot.record_action(turn, bot.plan_action(turn, Deadline.after(0.3)))
+        assert planner.rollouts > 0
+    finally:
+        planner.shutdown()
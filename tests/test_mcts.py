@@ -0,0 +1,48 @@
+import random
+
+import main
+import mcts
+from benchmarks.synthetic import make_initial_state, make_turn
+from scheduler import Deadline
+
+
+def test_planners_share_one_pool():
+    pool = mcts.SearchPool(1)
+    try:
+        games = []
+        for seed in (1, 2):
+            # Two maps: the worker keeps a model for each
+            rng = random.Random(seed)
+            state = make_initial_state(size=15, lighthouses=6, rng=rng)
+            positions = [(lh.Position.X, lh.Position.Y) for lh in state.Lighthouses]
+            planner = mcts.MctsPlanner(pool=pool)
+            bot = main.BotGame(1, planner=planner)
+            bot.load_initial_state(state)
+            games.append((bot, planner, positions, rng))
+        executor = pool.start()
+        for _ in range(2):
+            for bot, planner, positions, rng in games:
+                turn = make_turn(positions=positions, size=15, rng=rng)
+                bot.record_action(turn, bot.plan_action(turn, Deadline.after(0.2)))
+        assert all(planner.workers == 1 and planner.rollouts > 0 for _, planner, _, _ in games)
+
+        # A planner shutting down leaves the shared pool to the others
+        games[0][1].shutdown()
+        assert pool.start() is executor
+        assert executor.submit(mcts._warm_up).result(timeout=5)
+    finally:
+        pool.shutdown()
+
+
+def test_queued_search_stops_at_its_deadline():
+    # A worker search picked up after its turn ended returns at once
+    rng = random.Random(0)
+    state = make_initial_state(size=15, lighthouses=6, rng=rng)
+    bot = main.BotGame(1)
+    bot.load_initial_state(state)
+    model = mcts.ForwardModel(bot.game_map, bot.game_map.lighthouses)
+    turn = make_turn(positions=bot.game_map.lighthouses, size=15, rng=rng)
+    bot.plan_action(turn)
+    root = model.root(bot.snapshot, bot.lighthouses.connections, bot.connection_index.live)
+    expired = Deadline.after(-1).expires_at
+    assert mcts._search_worker(model.spec(), root, 1, expired, 0, mcts.HORIZON, mcts.EXPLORATION) == ({}, 0)
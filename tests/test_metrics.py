@@ -0,0 +1,34 @@
+import json
+import random
+
+import main
+from benchmarks.synthetic import make_initial_state, make_turn
+from metrics import Metrics, write_snapshots
+
+
+def test_snapshot_written_when_stopped(tmp_path):
+    path = str(tmp_path / "metrics.json")
+    metrics = Metrics()
+    # An interval no test reaches: only the final snapshot is written
+    stop = write_snapshots(path, interval=60, metrics=metrics)
+    metrics.inc("abandoned_turns", "Turn")
+    stop()
+    with open(path) as snapshot:
+        assert json.load(snapshot)["counters"] == {"abandoned_turns/Turn": 1}
+
+
+def test_transposition_lookups_are_exported():
+    rng = random.Random(0)
+    state = make_initial_state(rng=rng)
+    positions = [(lh.Position.X, lh.Position.Y) for lh in state.Lighthouses]
+    metrics = Metrics()
+    bot = main.BotGame(1, cache_size=64, metrics=metrics)
+    bot.load_initial_state(state)
+    turn = make_turn(positions=positions, rng=rng)
+    for _ in range(3):
+        bot.record_action(turn, bot.plan_action(turn))
+    counters = metrics.snapshot()["counters"]
+    table = bot.transposition
+    assert table.hits + table.misses > 0
+    assert counters.get("transposition_hits/actions", 0) == table.hits
+    assert counters.get("transposition_misses/actions", 0) == table.misses
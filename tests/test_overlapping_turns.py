@@ -0,0 +1,138 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent import futures
+
+import grpc
+import pytest
+
+import main
+from benchmarks.synthetic import make_initial_state, make_turn
+from internal.handler.coms import game_pb2_grpc as game_grpc
+from metrics import Metrics
+
+TURNS = 60
+BURST = 3
+PLAN_SECONDS = 0.02
+TIMEOUT = 0.2
+
+
+def slow_planner(plan, seconds):
+    # Takes `seconds` unless its deadline expires (or is cancelled) first,
+    # like MCTS running to the end of its budget
+    def planned(turn, deadline=None):
+        end = time.monotonic() + seconds
+        while time.monotonic() < end and not (deadline and deadline.expired()):
+            time.sleep(0.001)
+        return plan(turn, deadline)
+    return planned
+
+
+def start_thread_server(servicer):
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=BURST + 1))
+    game_grpc.add_GameServiceServicer_to_server(servicer, server)
+    port = server.add_insecure_port("localhost:0")
+    server.start()
+    return port, lambda: server.stop(0).wait()
+
+
+def start_aio_server(servicer):
+    # The server lives on its own event loop thread and is stopped from
+    # inside that loop
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    ports = []
+    stopping = None
+
+    async def serve():
+        nonlocal stopping
+        stopping = asyncio.Event()
+        server = grpc.aio.server()
+        game_grpc.add_GameServiceServicer_to_server(servicer, server)
+        ports.append(server.add_insecure_port("localhost:0"))
+        await server.start()
+        started.set()
+        await stopping.wait()
+        await server.stop(0)
+
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True)
+    thread.start()
+    assert started.wait(30)
+
+    def stop():
+        loop.call_soon_threadsafe(stopping.set)
+        thread.join(30)
+        loop.close()
+
+    return ports[0], stop
+
+
+@pytest.mark.parametrize("mode", ["thread", "aio"])
+def test_overlapping_turns_keep_history_consistent(mode):
+    rng = random.Random(0)
+    state = make_initial_state(size=30, lighthouses=20, rng=rng)
+    positions = [(lh.Position.X, lh.Position.Y) for lh in state.Lighthouses]
+    turns = []
+    for number in range(TURNS):
+        turn = make_turn(3, size=30, positions=positions, rng=rng)
+        # Score tags each call
+        turn.Score = number
+        turns.append(turn)
+
+    metrics = Metrics()
+    servicer = (main.AsyncClientServer if mode == "aio" else main.ClientServer)(1, metrics=metrics)
+    servicer.bg.plan_action = slow_planner(servicer.bg.plan_action, PLAN_SECONDS)
+    committed = []
+    record_action = servicer.bg.record_action
+
+    def record(turn, action):
+        committed.append((turn.Score, action.Action, action.Destination.X, action.Destination.Y))
+        record_action(turn, action)
+    servicer.bg.record_action = record
+
+    port, stop = start_aio_server(servicer) if mode == "aio" else start_thread_server(servicer)
+    answers = {}
+    try:
+        with grpc.insecure_channel(f"localhost:{port}") as channel:
+            stub = game_grpc.GameServiceStub(channel)
+            stub.InitialState(state, timeout=30)
+
+            def call(request):
+                action = stub.Turn(request, timeout=TIMEOUT)
+                answers[request.Score] = (action.Action, action.Destination.X, action.Destination.Y)
+
+            # Bursts of calls a millisecond apart: each one supersedes the
+            # previous while it is still planning
+            with futures.ThreadPoolExecutor(max_workers=BURST) as pool:
+                for first in range(0, TURNS, BURST):
+                    pending = []
+                    for request in turns[first:first + BURST]:
+                        pending.append(pool.submit(call, request))
+                        time.sleep(0.001)
+                    for future in pending:
+                        future.result()
+        # Commits still queued on the planner thread (fallbacks of overruns)
+        asyncio.run(servicer.scheduler.call_async(lambda: None))
+    finally:
+        stop()
+        servicer.close()
+
+    # Every call was answered, and stale ones were cut short without
+    # leaving a trace
+    assert len(answers) == TURNS
+    assert servicer.scheduler.superseded > 0
+    assert len(committed) <= TURNS - servicer.scheduler.superseded
+    # Each turn is recorded at most once, with the action it was answered
+    scores = [score for score, *_ in committed]
+    assert len(scores) == len(set(scores))
+    for score, *action in committed:
+        assert answers[score] == tuple(action)
+    # ... and the history holds exactly the recorded turns, in order
+    history = servicer.bg.turn_states
+    assert servicer.bg.countT == history.total == len(committed)
+    assert [record.score for record in history] == scores[-history.capacity:]
+    # Every other call was abandoned; an overrun is both (plan dropped,
+    # fallback recorded)
+    abandoned = metrics.snapshot()["counters"].get("abandoned_turns/Turn", 0)
+    assert len(committed) + abandoned - servicer.scheduler.overruns == TURNS
@@ -0,0 +1,77 @@
+import itertools
+import random
+import statistics
+import time
+
+import pathfinding
+
+# Largest view radius the bot is run with (loadtest, benchmarks)
+MAX_VIEW_RADIUS = 7
+
+
+def legacy_paths(view_distance, start, end, centered_view, extra_turns, gained_energy, path):
+    # The exhaustive search next_move used before the layered DP: every path
+    # towards the end with at most one step away from it
+    start_i, start_j = start
+    end_i, end_j = end
+    if start == end or max(abs(start_i), abs(start_j)) == view_distance:
+        yield gained_energy, -extra_turns, path
+        return
+    norm_0 = max(abs(end_i - start_i), abs(end_j - start_j))
+    for mi, mj in pathfinding.MOVEMENTS:
+        next_position = next_i, next_j = start_i + mi, start_j + mj
+        if next_position in centered_view:
+            next_norm_0 = max(abs(end_i - next_i), abs(end_j - next_j))
+            next_energy = gained_energy + centered_view[next_position]
+            next_path = path + ((mi, mj),)
+            if next_norm_0 <= norm_0:
+                yield from legacy_paths(view_distance, next_position, end, centered_view, extra_turns, next_energy, next_path)
+            elif extra_turns and next_norm_0 == norm_0 + 1:
+                yield from legacy_paths(view_distance, next_position, end, centered_view, extra_turns - 1, next_energy, next_path)
+
+
+def legacy_best_moves(view, end):
+    # First moves of every path with the legacy search's best energy: the
+    # legacy search broke ties on the path itself, so any of them is as good
+    view_distance = len(view) // 2
+    centered_view = {
+        (i - view_distance, j - view_distance): energy
+        for i, row in enumerate(view)
+        for j, energy in enumerate(row)
+    }
+    paths = list(legacy_paths(view_distance, (0, 0), end, centered_view, 1, 0, ()))
+    best = max(energy for energy, _, _ in paths)
+    return {path[0] for energy, _, path in paths if energy == best}
+
+
+def test_matches_legacy_search_on_every_3x3_view():
+    # Only 3x3 views: beyond them the legacy search never ends, as it may
+    # step sideways back and forth without getting closer
+    targets = [end for end in itertools.product(range(-2, 3), repeat=2) if end != (0, 0)]
+    mismatches = []
+    # Energies 0-2 on the 8 cells around the center, which the bot never re-enters
+    for ring in itertools.product(range(3), repeat=8):
+        cells = list(ring[:4]) + [0] + list(ring[4:])
+        view = [cells[0:3], cells[3:6], cells[6:9]]
+        for end in targets:
+            move = pathfinding.next_move((0, 0), end, view)
+            if move not in legacy_best_moves(view, end):
+                mismatches.append((view, end, move))
+    assert mismatches == []
+
+
+def test_next_move_under_a_millisecond_at_largest_view():
+    rng = random.Random(0)
+    side = 2 * MAX_VIEW_RADIUS + 1
+    # Targets on or beyond the view border give the longest searches
+    cases = [
+        ([rng.randrange(101) for _ in range(side * side)],
+         (rng.choice((-1, 1)) * rng.randint(MAX_VIEW_RADIUS, 3 * MAX_VIEW_RADIUS), rng.randint(-3 * MAX_VIEW_RADIUS, 3 * MAX_VIEW_RADIUS)))
+        for _ in range(200)
+    ]
+    timings = []
+    for cells, end in cases:
+        start = time.perf_counter()
+        pathfinding.next_move_in_view((0, 0), end, cells, MAX_VIEW_RADIUS)
+        timings.append(time.perf_counter() - start)
+    assert statistics.median(timings) < 1e-3
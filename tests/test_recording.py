@@ -0,0 +1,39 @@
+import random
+import shutil
+
+import pytest
+
+from benchmarks.synthetic import make_initial_state, make_turn
+from internal.handler.coms import game_pb2
+from recording import GameLog, GameRecorder
+
+
+@pytest.fixture
+def recording(tmp_path):
+    rng = random.Random(0)
+    path = str(tmp_path / "game.rec")
+    recorder = GameRecorder(path, seed=1)
+    recorder.initial_state(make_initial_state(rng=rng))
+    for _ in range(3):
+        recorder.turn(make_turn(rng=rng), game_pb2.NewAction(Action=game_pb2.PASS))
+    recorder.close()
+    with GameLog(path) as log:
+        ends = [log._record(offset)[2] for offset in log.offsets]
+    return path, ends
+
+
+@pytest.mark.parametrize("cut", [1, 2, 5, 20, 50])
+@pytest.mark.parametrize("keep_index", [True, False])
+def test_truncated_log_drops_partial_records(recording, tmp_path, cut, keep_index):
+    path, ends = recording
+    truncated = str(tmp_path / "truncated.rec")
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(truncated, "wb") as f:
+        f.write(data[:len(data) - cut])
+    if keep_index:
+        shutil.copy(path + ".idx", truncated + ".idx")
+
+    with GameLog(truncated) as log:
+        assert len(log) == sum(end <= len(data) - cut for end in ends)
+        assert [kind for kind, _ in log] == [1, 2, 3, 2, 3, 2, 3][:len(log)]
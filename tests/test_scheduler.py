@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+from scheduler import Deadline, TurnScheduler
+
+
+def failing_plan(deadline):
+    raise RuntimeError("planner bug")
+
+
+def test_run_answers_fallback_when_planner_raises():
+    scheduler = TurnScheduler(default_budget=1.0)
+    committed = []
+    try:
+        assert scheduler.run(None, failing_plan, lambda: "fallback", committed.append) == "fallback"
+        # The fallback is recorded as the turn's action, never None
+        assert committed == ["fallback"]
+        # The planner thread survives for the next turn
+        assert scheduler.run(None, lambda deadline: "planned", lambda: "fallback") == "planned"
+    finally:
+        scheduler.shutdown()
+
+
+def test_run_answers_fallback_when_commit_raises():
+    scheduler = TurnScheduler(default_budget=1.0)
+
+    def commit(action):
+        raise ValueError("history full")
+
+    try:
+        assert scheduler.run(None, lambda deadline: "planned", lambda: "fallback", commit) == "fallback"
+    finally:
+        scheduler.shutdown()
+
+
+def test_run_async_answers_fallback_when_planner_raises():
+    scheduler = TurnScheduler(default_budget=1.0)
+    committed = []
+    try:
+        action = asyncio.run(scheduler.run_async(None, failing_plan, lambda: "fallback", committed.append))
+        assert action == "fallback"
+        assert committed == ["fallback"]
+    finally:
+        scheduler.shutdown()
+
+
+def test_run_answers_fallback_before_the_deadline():
+    scheduler = TurnScheduler(default_budget=0.2, safety_margin=0.05)
+
+    def slow_plan(deadline):
+        # Ignores its deadline
+        time.sleep(0.5)
+        return "late"
+
+    try:
+        start = time.monotonic()
+        assert scheduler.run(None, slow_plan, lambda: "fallback") == "fallback"
+        assert time.monotonic() - start < 0.2
+        assert scheduler.overruns == 1
+    finally:
+        scheduler.shutdown()
+
+
+def test_cancelled_deadline_expires_its_slices():
+    deadline = Deadline.after(10.0)
+    part = deadline.slice(0.5)
+    assert not part.expired()
+    deadline.cancel()
+    assert part.expired()
+    assert part.remaining() == 0.0
@@ -0,0 +1,162 @@
+import random
+
+from energymap import regeneration
+from internal.handler.coms import game_pb2
+from simulator import LIGHTHOUSE_DECAY, LIGHTHOUSE_POINTS, LINK_POINTS, Simulation
+
+# 9x9 island: border walls plus one inner wall at (4, 4)
+ROWS = [[0 if x in (0, 8) or y in (0, 8) or (x, y) == (4, 4) else 1 for x in range(9)] for y in range(9)]
+LIGHTHOUSES = [(1, 1), (7, 1), (1, 7)]
+
+
+class Scripted:
+    # Plays the queued actions, then passes
+    def __init__(self):
+        self.actions = []
+        self.turns = []
+
+    def InitialState(self, request, context):
+        return game_pb2.PlayerReady(Ready=True)
+
+    def Turn(self, request, context):
+        self.turns.append(request)
+        if self.actions:
+            return self.actions.pop(0)
+        return game_pb2.NewAction(Action=game_pb2.PASS)
+
+
+def action(kind, pos=(0, 0), energy=0):
+    return game_pb2.NewAction(Action=kind, Destination=game_pb2.Position(X=pos[0], Y=pos[1]), Energy=energy)
+
+
+def simulation(players=1):
+    sim = Simulation(ROWS, LIGHTHOUSES, [Scripted() for _ in range(players)], rng=random.Random(0))
+    for player in sim.players:
+        player.position = (2, 2)
+    return sim
+
+
+def test_moves_only_to_adjacent_playable_cells():
+    sim = simulation()
+    player = sim.players[0]
+    assert sim._apply(player, action(game_pb2.MOVE, (3, 3)))
+    assert player.position == (3, 3)
+    # Into the inner wall, two cells away, off the island
+    assert not sim._apply(player, action(game_pb2.MOVE, (4, 4)))
+    assert not sim._apply(player, action(game_pb2.MOVE, (5, 3)))
+    player.position = (1, 1)
+    assert not sim._apply(player, action(game_pb2.MOVE, (0, 1)))
+    assert player.position == (1, 1)
+
+
+def test_cells_regrow_and_are_harvested():
+    sim = simulation(2)
+    assert list(sim.regen) == list(regeneration(sim))
+    # Lighthouse cell: 5 from its own lighthouse, none from the others
+    assert sim.regen[1 * 9 + 1] == 5
+    sim.players[1].position = (1, 1)
+    sim.step()
+    sim.step()
+    # Harvested every round: the cell never accumulates
+    assert sim.players[0].energy == 2 * sim.regen[2 * 9 + 2]
+    assert sim.players[1].energy == 2 * 5
+    assert sim.energy[1 * 9 + 1] == 0
+    assert sim.players[1].keys == {0}
+    # Players sharing a cell split its energy
+    sim.players[0].position = (1, 1)
+    sim.step()
+    assert sim.players[0].energy == 2 * sim.regen[2 * 9 + 2] + 2
+
+
+def test_attack_takes_weakens_and_neutralizes():
+    sim = simulation(2)
+    first, second = sim.players
+    first.position = second.position = (1, 1)
+    first.energy, second.energy = 50, 50
+    assert not sim._apply(first, action(game_pb2.ATTACK, (1, 1), 60))
+    assert sim._apply(first, action(game_pb2.ATTACK, (1, 1), 30))
+    assert (sim.owners[0], sim.lighthouse_energy[0], first.energy) == (first.id, 30, 20)
+    # The owner reinforces its own lighthouse
+    assert sim._apply(first, action(game_pb2.ATTACK, (1, 1), 10))
+    assert sim.lighthouse_energy[0] == 40
+    assert sim._apply(second, action(game_pb2.ATTACK, (1, 1), 15))
+    assert (sim.owners[0], sim.lighthouse_energy[0]) == (first.id, 25)
+    # Draining it exactly leaves it to nobody
+    assert sim._apply(second, action(game_pb2.ATTACK, (1, 1), 25))
+    assert (sim.owners[0], sim.lighthouse_energy[0]) == (0, 0)
+    # Only on a lighthouse
+    second.position = (2, 2)
+    assert not sim._apply(second, action(game_pb2.ATTACK, (2, 2), 1))
+
+
+def own(sim, player, *lighthouses):
+    for i in lighthouses:
+        sim.owners[i] = player.id
+        sim.lighthouse_energy[i] = 100
+
+
+def test_connect_needs_ownership_and_the_key():
+    sim = simulation()
+    player = sim.players[0]
+    player.position = (1, 1)
+    own(sim, player, 0)
+    # The target is not ours yet
+    player.keys = {1}
+    assert not sim._apply(player, action(game_pb2.CONNECT, (7, 1)))
+    own(sim, player, 1)
+    player.keys = set()
+    assert not sim._apply(player, action(game_pb2.CONNECT, (7, 1)))
+    player.keys = {1}
+    assert sim._apply(player, action(game_pb2.CONNECT, (7, 1)))
+    assert sim.connections[0] == 1 << 1 and sim.connections[1] == 1 << 0
+    assert player.keys == set()
+    # Not from a cell without a lighthouse
+    player.position = (2, 2)
+    player.keys = {2}
+    assert not sim._apply(player, action(game_pb2.CONNECT, (1, 7)))
+
+
+def covered_cells(a, b, c):
+    def side(p, q, r):
+        return (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+    cells = 0
+    for y, row in enumerate(ROWS):
+        for x, cell in enumerate(row):
+            signs = (side(a, b, (x, y)), side(b, c, (x, y)), side(c, a, (x, y)))
+            if cell and (min(signs) >= 0 or max(signs) <= 0):
+                cells += 1
+    return cells
+
+
+def test_score_counts_lighthouses_links_and_triangle_cells():
+    sim = simulation(2)
+    player = sim.players[0]
+    own(sim, player, 0, 1)
+    sim.connections[0], sim.connections[1] = 1 << 1, 1 << 0
+    sim._score()
+    assert player.score == 2 * LIGHTHOUSE_POINTS + LINK_POINTS
+    assert sim.players[1].score == 0
+
+    own(sim, player, 2)
+    sim.connections = [0b110, 0b101, 0b011]
+    player.score = 0
+    sim._score()
+    cells = covered_cells(*LIGHTHOUSES)
+    # x + y <= 8 inside the island, less the wall at (4, 4) on the long side
+    assert cells == 27
+    assert player.score == 3 * LIGHTHOUSE_POINTS + 3 * LINK_POINTS + cells
+
+
+def test_decay_loses_the_lighthouse_and_its_links():
+    sim = simulation()
+    player = sim.players[0]
+    own(sim, player, 0, 1)
+    sim.lighthouse_energy[0] = 2 * LIGHTHOUSE_DECAY
+    sim.connections[0], sim.connections[1] = 1 << 1, 1 << 0
+    sim.legality.apply([(0, 1)], [])
+    sim.step()
+    assert sim.owners[0] == player.id and sim.lighthouse_energy[0] == LIGHTHOUSE_DECAY
+    sim.step()
+    assert sim.owners[0] == 0
+    assert sim.connections == [0, 0, 0]
+    assert sim.owners[1] == player.id and sim.lighthouse_energy[1] == 100 - 2 * LIGHTHOUSE_DECAY
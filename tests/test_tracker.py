@@ -0,0 +1,49 @@
+from geometry import ConnectionIndex
+from internal.handler.coms import game_pb2
+from snapshot import TurnSnapshot
+from tracker import LighthouseTracker
+
+POSITIONS = [(1, 1), (5, 1), (1, 5), (5, 5)]
+
+
+def make_turn(owners, links):
+    connections = {i: [] for i in range(len(POSITIONS))}
+    for i, j in links:
+        connections[i].append(POSITIONS[j])
+        connections[j].append(POSITIONS[i])
+    return game_pb2.NewTurn(
+        Position=game_pb2.Position(X=1, Y=1),
+        Lighthouses=[
+            game_pb2.Lighthouse(
+                Position=game_pb2.Position(X=x, Y=y),
+                Owner=owner,
+                Connections=[game_pb2.Position(X=cx, Y=cy) for cx, cy in connections[i]],
+            )
+            for i, ((x, y), owner) in enumerate(zip(POSITIONS, owners))
+        ],
+    )
+
+
+def test_link_added_between_lighthouses_whose_link_count_did_not_change():
+    # 0-1 and 2-3 are dropped as 1 and 3 change owner, while 0-2 is made:
+    # lighthouses 0 and 2 keep one link each
+    tracker = LighthouseTracker(player_num=1)
+    index = ConnectionIndex(POSITIONS)
+    snap = TurnSnapshot.decode(make_turn([1, 1, 1, 1], [(0, 1), (2, 3)]))
+    tracker.update(snap)
+    index.sync(tracker.connections)
+
+    snap = TurnSnapshot.decode(make_turn([1, 2, 1, 2], [(0, 2)]), snap)
+    changes = tracker.update(snap)
+    index.apply(changes.links_added, changes.links_removed)
+
+    assert sorted(changes.links_added) == [(0, 2)]
+    assert sorted(changes.links_removed) == [(0, 1), (2, 3)]
+    assert tracker.connections == [snap.connection_mask(i) for i in range(len(POSITIONS))]
+    assert tracker.is_connected(0, 2) and not tracker.is_connected(0, 1)
+    expected = ConnectionIndex(POSITIONS)
+    expected.sync([snap.connection_mask(i) for i in range(len(POSITIONS))])
+    assert index.live == expected.live
+    # 0-1 is gone, so it can be made again; 0-2 now exists
+    assert index.is_legal(0, 1)
+    assert not index.is_legal(0, 2)
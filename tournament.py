@@ -0,0 +1,182 @@
+import argparse
+import ast
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import simulator
+
+Z_95 = 1.96
+
+
+def play_game(task):
+    # One self-play game in a worker process; the map and the bots' RNG come
+    # from the task seed so a task always replays the same game
+    game_id, seats, size, lighthouses, rounds, seed, map_cache = task
+    import main
+    from mapcache import MapCache
+
+    rng = random.Random(seed)
+    random.seed(seed)
+    rows, positions = simulator.generate_map(size, lighthouses, rng=rng)
+    # Every seat rotation replays the same map: the bots share its precomputation
+    cache = MapCache(map_cache) if map_cache else None
+    bots = [main.ClientServer(bot_id=i + 1, params=params, map_cache=cache) for i, (_, params) in enumerate(seats)]
+    try:
+        result = simulator.Simulation(rows, positions, bots, names=[name for name, _ in seats], rng=rng).run(rounds)
+    finally:
+        for bot in bots:
+            bot.close()
+    result["game"] = game_id
+    result["seed"] = seed
+    return result
+
+
+def schedule(configs, players, games, size, lighthouses, rounds, seed, map_cache=None):
+    # Every combination of `players` configs meets on `games` maps, once per
+    # seat rotation so no configuration keeps the first move
+    names = sorted(configs)
+    tasks = []
+    for match, combo in enumerate(itertools.combinations(names, players)):
+        for game in range(games):
+            game_seed = seed * 1_000_003 + match * 10_007 + game
+            for shift in range(players):
+                seats = combo[shift:] + combo[:shift]
+                tasks.append((len(tasks), [(name, configs[name]) for name in seats],
+                              size, lighthouses, rounds, game_seed, map_cache))
+    return tasks
+
+
+def _wilson(wins: float, games: int):
+    if not games:
+        return 0.0, 0.0
+    p = wins / games
+    denominator = 1 + Z_95 ** 2 / games
+    center = (p + Z_95 ** 2 / (2 * games)) / denominator
+    margin = Z_95 * math.sqrt(p * (1 - p) / games + Z_95 ** 2 / (4 * games ** 2)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def aggregate(results) -> dict:
+    # Per configuration: win rate with a Wilson 95% interval (ties split the
+    # win) and mean score with a normal 95% interval
+    scores = {}
+    wins = {}
+    invalid = {}
+    for result in results:
+        players = result["players"]
+        best = max(p["score"] for p in players)
+        winners = [p for p in players if p["score"] == best]
+        for p in players:
+            scores.setdefault(p["name"], []).append(p["score"])
+            invalid[p["name"]] = invalid.get(p["name"], 0) + p["invalid_actions"]
+            wins[p["name"]] = wins.get(p["name"], 0.0) + (1 / len(winners) if p in winners else 0.0)
+
+    summary = {}
+    for name, values in scores.items():
+        games = len(values)
+        mean = sum(values) / games
+        variance = sum((v - mean) ** 2 for v in values) / (games - 1) if games > 1 else 0.0
+        margin = Z_95 * math.sqrt(variance / games)
+        summary[name] = {
+            "games": games,
+            "win_rate": wins[name] / games,
+            "win_rate_ci": _wilson(wins[name], games),
+            "mean_score": mean,
+            "mean_score_ci": (mean - margin, mean + margin),
+            "invalid_actions": invalid[name],
+        }
+    return summary
+
+
+def run_tournament(configs, players=2, games=10, size=15, lighthouses=8, rounds=500, seed=0, workers=None,
+                   map_cache=None):
+    tasks = schedule(configs, players, games, size, lighthouses, rounds, seed, map_cache)
+    workers = workers or os.cpu_count() or 1
+    # Spawned workers start without the parent's gRPC threads or RNG state
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        chunksize = max(1, len(tasks) // (workers * 4))
+        return list(pool.map(play_game, tasks, chunksize=chunksize))
+
+
+def _parse_value(text: str):
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def parse_configs(config_args, sweep_args) -> dict:
+    # --config name:key=value,key=value names a configuration explicitly;
+    # --sweep key=v1,v2 adds the cartesian product of all sweeps over the
+    # defaults, named after the values that differ
+    configs = {}
+    for spec in config_args:
+        name, _, assignments = spec.partition(":")
+        params = {}
+        for assignment in filter(None, assignments.split(",")):
+            key, _, value = assignment.partition("=")
+            params[key] = _parse_value(value)
+        configs[name] = params
+
+    sweeps = []
+    for spec in sweep_args:
+        key, _, values = spec.partition("=")
+        sweeps.append([(key, _parse_value(value)) for value in values.split(",")])
+    for combo in itertools.product(*sweeps) if sweeps else ():
+        configs[",".join(f"{key}={value}" for key, value in combo)] = dict(combo)
+
+    if not configs:
+        configs["default"] = {}
+    return configs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Self-play tournament between BotGame configurations")
+    parser.add_argument("--config", action="append", default=[], help="name:key=value,... (repeatable)")
+    parser.add_argument("--sweep", action="append", default=[], help="key=v1,v2,... (repeatable)")
+    parser.add_argument("--players", type=int, default=2, help="Bots per game")
+    parser.add_argument("--games", type=int, default=10, help="Maps per matchup, each played in every seat order")
+    parser.add_argument("--size", type=int, default=15)
+    parser.add_argument("--lighthouses", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--json", default=None, help="Also write the summary to this file")
+    parser.add_argument("--map-cache", default=None, help="Share per-map precomputation through this directory")
+    args = parser.parse_args()
+
+    import main as bot
+    configs = parse_configs(args.config, args.sweep)
+    for params in configs.values():
+        bot.BotGame(params=params)  # rejects unknown parameters before spawning workers
+    if len(configs) < args.players:
+        parser.error(f"Need at least {args.players} configurations for {args.players}-player games")
+
+    start_time = time.perf_counter()
+    results = run_tournament(configs, args.players, args.games, args.size, args.lighthouses,
+                             args.rounds, args.seed, args.workers, args.map_cache)
+    elapsed = time.perf_counter() - start_time
+    summary = aggregate(results)
+
+    print(f"{len(results)} games in {elapsed:.1f} s ({len(results) / elapsed:.1f} games/s)")
+    print(f"{'config':<40} {'games':>5} {'win rate':>22} {'mean score':>28}")
+    for name, row in sorted(summary.items(), key=lambda item: item[1]["win_rate"], reverse=True):
+        low, high = row["win_rate_ci"]
+        score_low, score_high = row["mean_score_ci"]
+        print(f"{name:<40} {row['games']:>5} {row['win_rate']:>8.3f} [{low:.3f}, {high:.3f}] "
+              f"{row['mean_score']:>10.1f} [{score_low:.1f}, {score_high:.1f}]")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump({"configs": configs, "elapsed": elapsed, "summary": summary}, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
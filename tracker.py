@@ -0,0 +1,163 @@
+from array import array
+
+from geometry import bits
+from snapshot import TurnSnapshot
+
+
+class TurnChanges:
+    __slots__ = ("reset", "owners", "energies", "keys", "links_added", "links_removed")
+
+    def __init__(self, reset: bool = False):
+        self.reset = reset
+        self.owners = []  # (lighthouse, old owner, new owner)
+        self.energies = []  # (lighthouse, energy delta)
+        self.keys = []  # lighthouses whose key we just got
+        self.links_added = []  # (i, j) with i < j
+        self.links_removed = []
+
+    def __bool__(self):
+        return bool(
+            self.reset or self.owners or self.energies or self.keys
+            or self.links_added or self.links_removed
+        )
+
+
+class LighthouseTracker:
+    # Persistent lighthouse table updated from each turn's snapshot. Unchanged
+    # columns are detected with a single array comparison, and the derived
+    # views (owned / enemy / key bitmasks and per-lighthouse connection
+    # masks) are only touched for the lighthouses that actually changed.
+    def __init__(self, player_num=None):
+        self.player_num = player_num
+        self.positions = []
+        self.owners = array("i")
+        self.energies = array("i")
+        self.keys = bytearray()
+        self.link_counts = array("i")
+        self.connections = []
+        # Bitmasks by lighthouse index; enemies includes neutral lighthouses
+        self.owned = 0
+        self.enemies = 0
+        self.key_mask = 0
+        self.turn = 0
+
+    def update(self, snap: TurnSnapshot) -> TurnChanges:
+        self.turn += 1
+        if snap.positions is not self.positions and snap.positions != self.positions:
+            return self._reset(snap)
+
+        changes = TurnChanges()
+        self.positions = snap.positions
+        dirty_links = set()
+
+        if snap.owners != self.owners:
+            for i, (old, new) in enumerate(zip(self.owners, snap.owners)):
+                if old != new:
+                    changes.owners.append((i, old, new))
+                    self._set_owner(i, new)
+                    dirty_links.add(i)
+            self.owners = snap.owners
+
+        if snap.energies != self.energies:
+            changes.energies = [
+                (i, new - old)
+                for i, (old, new) in enumerate(zip(self.energies, snap.energies))
+                if old != new
+            ]
+            self.energies = snap.energies
+
+        if snap.keys != self.keys:
+            for i, (old, new) in enumerate(zip(self.keys, snap.keys)):
+                if old != new:
+                    if new:
+                        changes.keys.append(i)
+                        self.key_mask |= 1 << i
+                    else:
+                        self.key_mask &= ~(1 << i)
+            self.keys = snap.keys
+
+        if snap.link_counts != self.link_counts:
+            dirty_links.update(
+                i for i, (old, new) in enumerate(zip(self.link_counts, snap.link_counts))
+                if old != new
+            )
+            self.link_counts = snap.link_counts
+
+        # Links only drop when an end changes owner, and a lighthouse whose
+        # link count stayed the same while it gained a link must have lost
+        # another one. So every changed link is reached from the lighthouses
+        # whose owner or link count changed, plus the other end of each link
+        # dropped on the way; links are symmetric, so fixing both ends from
+        # the dirty side keeps the whole table consistent.
+        pending = list(dirty_links)
+        while pending:
+            i = pending.pop()
+            old_mask = self.connections[i]
+            new_mask = snap.connection_mask(i)
+            if old_mask == new_mask:
+                continue
+            for j in bits(new_mask & ~old_mask):
+                self._link(i, j, True, changes.links_added)
+            for j in bits(old_mask & ~new_mask):
+                self._link(i, j, False, changes.links_removed)
+                if j not in dirty_links:
+                    dirty_links.add(j)
+                    pending.append(j)
+
+        return changes
+
+    def owned_count(self) -> int:
+        return self.owned.bit_count()
+
+    def owned_lighthouses(self) -> list[int]:
+        return list(bits(self.owned))
+
+    def enemy_lighthouses(self) -> list[int]:
+        return list(bits(self.enemies))
+
+    def is_connected(self, i: int, j: int) -> bool:
+        return bool(self.connections[i] >> j & 1)
+
+    def connect_candidates(self, current: int) -> list[int]:
+        # Our lighthouses whose key we hold and that are not linked to current yet
+        if not self.owned >> current & 1:
+            return []
+        return list(bits(self.owned & self.key_mask & ~self.connections[current] & ~(1 << current)))
+
+    def _reset(self, snap: TurnSnapshot) -> TurnChanges:
+        count = len(snap.positions)
+        self.positions = snap.positions
+        self.owners = snap.owners
+        self.energies = snap.energies
+        self.keys = snap.keys
+        self.link_counts = snap.link_counts
+        self.connections = [snap.connection_mask(i) for i in range(count)]
+        self.owned = self.enemies = self.key_mask = 0
+        for i in range(count):
+            self._set_owner(i, snap.owners[i])
+            if snap.keys[i]:
+                self.key_mask |= 1 << i
+        return TurnChanges(reset=True)
+
+    def _set_owner(self, i: int, owner: int):
+        bit = 1 << i
+        if self.player_num is not None and owner == self.player_num:
+            self.owned |= bit
+            self.enemies &= ~bit
+        else:
+            self.owned &= ~bit
+            self.enemies |= bit
+
+    def _link(self, i: int, j: int, linked: bool, log: list):
+        pair = (i, j) if i < j else (j, i)
+        if linked:
+            if self.connections[j] >> i & 1 and self.connections[i] >> j & 1:
+                return
+            self.connections[i] |= 1 << j
+            self.connections[j] |= 1 << i
+        else:
+            if not (self.connections[j] >> i & 1 or self.connections[i] >> j & 1):
+                return
+            self.connections[i] &= ~(1 << j)
+            self.connections[j] &= ~(1 << i)
+        log.append(pair)
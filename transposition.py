@@ -0,0 +1,109 @@
+import random
+from collections import OrderedDict
+
+from snapshot import TurnSnapshot
+from tracker import LighthouseTracker, TurnChanges
+
+# Entries kept by each cache before the least recently used is dropped
+TABLE_SIZE = 4096
+
+
+class LruCache:
+    # Size-bounded mapping that forgets the least recently used entry.
+    # Values are never None, so a lookup is a single dict access. Hits and
+    # misses are also counted in `metrics` under the cache's `name`.
+    def __init__(self, size: int = TABLE_SIZE, metrics=None, name: str = "cache"):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.metrics = metrics
+        self.name = name
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            if self.metrics:
+                self.metrics.inc("transposition_misses", self.name)
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        if self.metrics:
+            self.metrics.inc("transposition_hits", self.name)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+class ZobristKeys:
+    # One random 64-bit key per feature (a hashable tuple), drawn the first
+    # time the feature is seen. A private RNG keeps the global seed of
+    # recorded games untouched.
+    def __init__(self, seed: int = 0):
+        self._rng = random.Random(seed)
+        self._keys = {}
+
+    def __getitem__(self, feature) -> int:
+        key = self._keys.get(feature)
+        if key is None:
+            key = self._keys[feature] = self._rng.getrandbits(64)
+        return key
+
+
+class TranspositionTable:
+    # Cache of evaluated actions across turns. Lighthouse
+    # owners and links are folded into a Zobrist hash updated from each
+    # turn's TurnChanges, so it costs one XOR per change; lighthouse and
+    # player energies enter the action key as the bitmask of lighthouses
+    # weaker than us, the only energy comparison the cascade makes. Paths
+    # are not cached: they depend on the whole view, which regrows every
+    # turn, and hit well under 1% of lookups in benchmarks.transposition.
+    def __init__(self, size: int = TABLE_SIZE, seed: int = 0, metrics=None):
+        self.zobrist = ZobristKeys(seed)
+        self.actions = LruCache(size, metrics, "actions")
+        self.lighthouse_hash = 0
+        self.view_key = None
+
+    @property
+    def hits(self) -> int:
+        return self.actions.hits
+
+    @property
+    def misses(self) -> int:
+        return self.actions.misses
+
+    def update(self, snap: TurnSnapshot, tracker: LighthouseTracker, changes: TurnChanges):
+        zobrist = self.zobrist
+        if changes.reset:
+            self.lighthouse_hash = 0
+            for i, owner in enumerate(tracker.owners):
+                self.lighthouse_hash ^= zobrist["owner", i, owner]
+            for i, mask in enumerate(tracker.connections):
+                for j in range(i + 1, len(tracker.connections)):
+                    if mask >> j & 1:
+                        self.lighthouse_hash ^= zobrist["link", i, j]
+        else:
+            for i, old, new in changes.owners:
+                self.lighthouse_hash ^= zobrist["owner", i, old] ^ zobrist["owner", i, new]
+            for i, j in changes.links_added:
+                self.lighthouse_hash ^= zobrist["link", i, j]
+            for i, j in changes.links_removed:
+                self.lighthouse_hash ^= zobrist["link", i, j]
+        self.view_key = hash((snap.view_distance, snap.view.tobytes()))
+
+    def action_key(self, snap: TurnSnapshot, tracker: LighthouseTracker, *flags) -> tuple:
+        # `flags` carries the bot's own state the decision depends on
+        energy = snap.energy
+        weaker = 0
+        for i, lh_energy in enumerate(snap.energies):
+            if lh_energy < energy:
+                weaker |= 1 << i
+        return self.lighthouse_hash, tracker.key_mask, weaker, snap.position, self.view_key, flags